@@ -0,0 +1,58 @@
+import numpy as np
+
+# 戦闘機の AI（Fighter.act）を機体ごとに異なる頻度で実行するスケジューラ
+# 交戦中・脅威あり・旋回中・画面端付近の機体は毎ティック、
+# 敵基地へ向けて直進しているだけの機体（巡航）は interval ティックに1回だけ判断する
+# 巡航機の判断ティックは slot ごとに位相をずらし、1ティックあたりの負荷を均す
+# 移動（move_fighters）は全機が毎ティック行う
+# 巡航の判定には機数によらない配列演算の固定費があるので、戦闘機が SCHEDULE_MIN_FIGHTERS 機未満なら間引かない
+
+TRANSIT_BEARING_TOLERANCE = 1.0  # 目標方向と敵基地の方位の差がこれ未満なら「直進中」とみなす（度）
+# 間引きを行う最小の戦闘機数（両チームの合計）。巡航中の判定と act の時間を計測すると、16機では間引く方が
+# 1ティックあたり約16 µs 遅く、24機では約27 µs 速い
+SCHEDULE_MIN_FIGHTERS = 20
+
+
+class AIScheduler:
+    def __init__(self, interval, width, height, edge_margin):
+        self.interval = interval  # 巡航機が判断するティック間隔（1 なら全機が毎ティック）
+        self.width = width
+        self.height = height
+        self.edge_margin = edge_margin  # 画面端回避を始める距離
+        self.base_x = None  # 戦闘機ごとの敵基地の位置（slot 順）
+        self.base_y = None
+
+    def invalidate(self):
+        # 戦闘機の向かう地点が変わったら呼ぶ（次の判断で作り直す）
+        self.base_x = self.base_y = None
+
+    def _cruising(self, state, tick):
+        # 今ティックは判断を省いてよい巡航機（slot 順の bool 配列）
+        n = state.count
+        if self.base_x is None or len(self.base_x) != n:
+            self.base_x = np.array([fighter.enemy_base[0] for fighter in state.objects], dtype=np.float64)
+            self.base_y = np.array([fighter.enemy_base[1] for fighter in state.objects], dtype=np.float64)
+        state.load('target_direction')
+        x, y = state.x[:n], state.y[:n]
+        direction, target_direction = state.direction[:n], state.target_direction[:n]
+
+        # 位相がずれた判断ティックの機体と、画面端の回避領域にいる機体は判断する
+        off_phase = (tick + np.arange(n)) % self.interval != 0
+        margin = self.edge_margin
+        inside = (x >= margin) & (x <= self.width - margin) & (y >= margin) & (y <= self.height - margin)
+
+        # 旋回を終えていて、目標方向が敵基地の方位から外れていない（リスポーン直後などは外れている）
+        bearing = np.degrees(np.arctan2(self.base_y - y, self.base_x - x)) % 360
+        bearing_diff = (bearing - target_direction + 180) % 360 - 180
+        settled = (direction == target_direction) & (np.abs(bearing_diff) < TRANSIT_BEARING_TOLERANCE)
+        return off_phase & inside & settled
+
+    def select(self, state, tick, contacts, missiles):
+        # 今ティックに act を実行する生存機のリスト（slot 順）
+        # contacts / missiles は戦闘機の slot で引けるデータリンクの航跡とレーダー範囲内のミサイル
+        fighters = state.objects
+        if self.interval <= 1 or state.count < SCHEDULE_MIN_FIGHTERS:
+            return [fighter for fighter in fighters if fighter.is_alive]
+        cruising = self._cruising(state, tick).tolist()
+        return [fighter for fighter, skip, near, threats in zip(fighters, cruising, contacts, missiles)
+                if fighter.is_alive and not (skip and not near and not threats and not fighter.avoiding_missile)]
@@ -1,6 +1,12 @@
-import pygame
+import math
 import random
 
+import numpy as np
+
+# 交戦規定（飛行隊ごと）
+ROE_WEAPONS_FREE = 'weapons_free'  # 攻撃コーンに入った敵機を撃ってよい
+ROE_WEAPONS_HOLD = 'weapons_hold'  # 撃たない（追尾と回避は続ける）
+
 class Aircraft:
     def __init__(self, x, y, speed, acceleration, color):
         self.x = x
@@ -16,13 +22,245 @@ class Aircraft:
             self.x = 0
 
     def draw(self, screen):
+        import pygame  # 描画するときだけ読み込む（データリンクはヘッドレスでも使うため）
         pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), 5)
 
 
 # 飛行隊クラス
+# aircrafts にシミュレーションの戦闘機を渡すと、編隊のデータリンクとして
+# 走査ティックを迎えた全機のレーダー探知を1回の問い合わせでまとめ、編隊で1つの航跡表を作る
+# 航跡表は編隊のどれかの機が探知した敵機と、その最後に探知された位置と時刻（敵機の slot 順）
+# 航跡は敵機が撃墜されるか、走査の間隔（coast）を過ぎてもどの機にも探知されなければ捨てる
+# 各機は自機のレーダーの探知ではなく航跡表を引き、Fighter.act が撃つ候補になる航跡だけを contacts として受け取る
+# 数機のワールドでは空間インデックスを使わず（enemy_index が None）、走査する機 × 敵機を1組ずつ調べる
+ATTACK_CONE_COS = math.cos(math.radians(22.5))  # 攻撃コーン（機首の前方 ±22.5 度）の境界の余弦
+TRACK_EPSILON = 1e-9  # 航跡の経過時間の比較で許容する丸め誤差（秒）
+# 編隊機 × 航跡の行列を一度に作る最大の要素数（大きな行列を一度に作ると一時配列がキャッシュに収まらず、
+# 300機の編隊では行のまとまりに分けた場合の約3倍の時間がかかる）
+CONTACT_BLOCK = 16384
+
+
 class Squadron:
-    def __init__(self, color):
-        self.aircrafts = [Aircraft(random.randint(0, 800), random.randint(0, 600), random.uniform(1, 3), random.uniform(-0.1, 0.1), color) for _ in range(3)]
+    def __init__(self, color, aircrafts=None):
+        self.color = color
+        if aircrafts is None:
+            aircrafts = [Aircraft(random.randint(0, 800), random.randint(0, 600), random.uniform(1, 3), random.uniform(-0.1, 0.1), color) for _ in range(3)]
+        self.aircrafts = aircrafts
+        self.roe = ROE_WEAPONS_FREE  # 交戦規定
+        self.member_slots = None  # 編隊の戦闘機の slot（状態配列の行）
+        empty = np.zeros(0)
+        self.set_tracks(np.zeros(0, dtype=np.int64), empty, empty, empty)
+        self.contacts = {}  # 戦闘機の slot → 航跡表から引いた [(敵機, 距離, 方位)]（距離順）
+
+    def set_tracks(self, enemy, x, y, time):
+        # 編隊で共有する航跡表（敵機の slot 順）
+        self.track_enemy = enemy  # 敵機の slot
+        self.track_x = x  # 最後に探知された敵機の位置
+        self.track_y = y
+        self.track_time = time  # 最後に探知された時刻（秒）
+
+    def _init_members(self):
+        self.member_slots = np.array([aircraft.slot for aircraft in self.aircrafts], dtype=np.int64)
+        self.radars = [aircraft.radar for aircraft in self.aircrafts]
+        self.ranges = np.array([radar.range for radar in self.radars], dtype=np.float64)
+        self.fovs = np.array([radar.fov for radar in self.radars], dtype=np.float64)
+        self.narrow = bool((self.fovs < 360).any())  # 全周でないレーダーがあるか
+        # どの機も必ず1回は走査する時間（これを過ぎても探知されない航跡は捨てる）
+        self.coast = max(radar.interval for radar in self.radars)
+
+    def update_tracks(self, state, enemy_index, time):
+        # 時刻 time のティックで走査する編隊機の位置から、敵機の空間インデックスへ1回だけ問い合わせて航跡表を更新し、
+        # 各機の contacts を航跡表から作り直す。戻り値は今回の走査で探知した敵機の数
+        # enemy_index が None なら（戦闘機とミサイルが SCALAR_LIMIT 以下のワールド）空間インデックスを使わない
+        if self.member_slots is None:
+            self._init_members()
+        if enemy_index is None:
+            alive = [aircraft.is_alive for aircraft in self.aircrafts]
+            found = self._scan_scalar(state, time, alive)
+            self._update_contacts_scalar(state, alive)
+            return found
+        alive = state.is_alive[self.member_slots]
+        found = self._scan(state, enemy_index, time, alive)
+        self.update_contacts(state, alive)
+        return found
+
+    def _detect(self, state, enemy_index, scanners):
+        # 走査する機（編隊内の番号）のどれかが探知した敵機の slot（昇順）
+        slots = self.member_slots[scanners]
+        mx, my = state.x[slots], state.y[slots]
+        ranges = self.ranges[scanners]
+        if not self.narrow and (ranges == ranges[0]).all():
+            # 全周で同じ探知距離なら、どの機が探知したかは要らないので組を作らずに印を付ける
+            return enemy_index.ids[enemy_index.covered(mx, my, ranges[0])]
+        qi, ids = enemy_index.query(mx, my, ranges.max())
+        dx = state.x[ids] - mx[qi]
+        dy = state.y[ids] - my[qi]
+        inside = dx * dx + dy * dy <= ranges[qi] ** 2
+        if self.narrow:
+            # 視野角の外（機首方向からの角度が視野角の半分を超える）を除く
+            fov = self.fovs[scanners][qi]
+            bearing = np.degrees(np.arctan2(dy, dx))
+            angle_diff = (bearing - state.direction[slots][qi] + 180) % 360 - 180
+            inside &= (fov >= 360) | (np.abs(angle_diff) <= fov / 2)
+        return np.unique(ids[inside])
+
+    def _scan(self, state, enemy_index, time, alive):
+        scanning = np.array([is_alive and radar.scan_due(time)
+                             for is_alive, radar in zip(alive.tolist(), self.radars)], dtype=bool)
+        scanners = np.flatnonzero(scanning)
+
+        # 撃墜された敵機と、走査の間隔を過ぎても探知されていない航跡を捨てる
+        keep = state.is_alive[self.track_enemy] & (time - self.track_time <= self.coast + TRACK_EPSILON)
+        if len(scanners) == 0:
+            if not keep.all():
+                self.set_tracks(*(array[keep] for array in
+                                  (self.track_enemy, self.track_x, self.track_y, self.track_time)))
+            return 0
+
+        seen = self._detect(state, enemy_index, scanners)
+        if len(seen) == 0 and len(self.track_enemy) == 0:
+            return 0  # 航跡が無く、今回も見つからない（巡航中のほとんどのティック）
+
+        # 今回探知した敵機は現在の位置と時刻で、それ以外の残す航跡は前のままで、敵機の slot 順に並べる
+        held = keep & ~np.isin(self.track_enemy, seen)
+        enemy = np.concatenate((self.track_enemy[held], seen))
+        order = np.argsort(enemy, kind='stable')
+        self.set_tracks(enemy[order],
+                        np.concatenate((self.track_x[held], state.x[seen]))[order],
+                        np.concatenate((self.track_y[held], state.y[seen]))[order],
+                        np.concatenate((self.track_time[held], np.full(len(seen), time)))[order])
+        return len(seen)
+
+    def _scan_scalar(self, state, time, alive):
+        # _scan の空間インデックスを使わない版（走査する機 × 生存している敵機を Python のスカラーで1組ずつ調べる）
+        # alive は編隊機ごとの生死のリスト
+        objects = state.objects
+        track_enemy = self.track_enemy.tolist()
+        track_time = self.track_time.tolist()
+        coast = self.coast + TRACK_EPSILON
+        keep = [objects[enemy].is_alive and time - seen_time <= coast
+                for enemy, seen_time in zip(track_enemy, track_time)]
+        scanners = [aircraft for aircraft, is_alive in zip(self.aircrafts, alive)
+                    if is_alive and aircraft.radar.scan_due(time)]
+        if not scanners:
+            if not all(keep):
+                keep = np.array(keep, dtype=bool)
+                self.set_tracks(*(array[keep] for array in
+                                  (self.track_enemy, self.track_x, self.track_y, self.track_time)))
+            return 0
+
+        # 探知距離の内側で、視野角が全周でなければ機首方向から視野角の半分以内にある敵機（_detect と同じ判定）
+        x, y = state.x[:state.count].tolist(), state.y[:state.count].tolist()
+        enemies = [fighter.slot for fighter in objects if fighter.is_alive and fighter.squadron is not self]
+        seen = set()
+        for aircraft in scanners:
+            radar = aircraft.radar
+            sx, sy = x[aircraft.slot], y[aircraft.slot]
+            range2 = radar.range * radar.range
+            narrow = radar.fov < 360
+            direction = aircraft.direction
+            for enemy in enemies:
+                dx, dy = x[enemy] - sx, y[enemy] - sy
+                if enemy in seen or dx * dx + dy * dy > range2:
+                    continue
+                if narrow:
+                    angle_diff = (math.degrees(math.atan2(dy, dx)) - direction + 180) % 360 - 180
+                    if abs(angle_diff) > radar.fov / 2:
+                        continue
+                seen.add(enemy)
+        if not seen and not track_enemy:
+            return 0
+
+        # 今回探知した敵機は現在の位置と時刻で、それ以外の残す航跡は前のままで、敵機の slot 順に並べる
+        tracks = {enemy: (tx, ty, seen_time) for enemy, tx, ty, seen_time, kept in
+                  zip(track_enemy, self.track_x.tolist(), self.track_y.tolist(), track_time, keep) if kept}
+        for enemy in seen:
+            tracks[enemy] = (x[enemy], y[enemy], time)
+        enemy = sorted(tracks)
+        tx, ty, seen_time = zip(*(tracks[slot] for slot in enemy)) if enemy else ((), (), ())
+        self.set_tracks(np.array(enemy, dtype=np.int64), np.array(tx, dtype=np.float64),
+                        np.array(ty, dtype=np.float64), np.array(seen_time, dtype=np.float64))
+        return len(seen)
+
+    def update_contacts(self, state, alive=None):
+        # 生存している各機について、航跡表から Fighter.act が撃つ候補になる航跡だけを引く
+        # act は回避中なら最初の探知を、そうでなければ攻撃コーン内の最初の探知を撃つので、距離順に
+        # 最も近い航跡と、攻撃コーン内で最も近い航跡（同じなら1つ）を渡せば十分（全機×全航跡の一覧は作らない）
+        if alive is None:
+            alive = state.is_alive[self.member_slots]
+        members = np.flatnonzero(alive)
+        enemies = self.track_enemy
+        if len(enemies) == 0 or len(members) == 0:
+            self.contacts = {}
+            return
+        slots = self.member_slots[members]
+        mx, my = state.x[slots], state.y[slots]
+        radians = np.radians(state.direction[slots])
+        cos, sin = np.cos(radians), np.sin(radians)
+        track_x, track_y = self.track_x, self.track_y
+        count = len(members)
+        nearest = np.empty(count, dtype=np.int64)
+        cone = np.empty(count, dtype=np.int64)
+        has_cone = np.empty(count, dtype=bool)
+        # 編隊機 × 航跡の行列は CONTACT_BLOCK 要素以下の行のまとまりごとに作る
+        block = max(CONTACT_BLOCK // len(enemies), 1)
+        for start in range(0, count, block):
+            rows = slice(start, start + block)
+            dx = track_x[None, :] - mx[rows, None]
+            dy = track_y[None, :] - my[rows, None]
+            distance2 = dx * dx + dy * dy
+            ahead = dx * cos[rows, None] + dy * sin[rows, None]
+            near = distance2.argmin(axis=1)
+            # コーン内: 機首方向の成分が正で、(成分 / 距離)² が境界の余弦の2乗より大きい（平方根と逆三角関数を使わない）
+            in_cone = (ahead > 0) & (ahead * ahead > ATTACK_CONE_COS ** 2 * distance2)
+            best = np.where(in_cone, distance2, np.inf).argmin(axis=1)
+            nearest[rows] = near
+            cone[rows] = best
+            has_cone[rows] = in_cone[np.arange(len(near)), best] & (best != near)
+
+        # 選んだ航跡の距離と方位だけを計算して Python のリストにする
+        rows = np.arange(count)
+        pick_row = np.concatenate((rows, rows[has_cone]))
+        pick = np.concatenate((nearest, cone[has_cone]))
+        pick_dx, pick_dy = track_x[pick] - mx[pick_row], track_y[pick] - my[pick_row]
+        bearing = (np.degrees(np.arctan2(pick_dy, pick_dx)) % 360).tolist()
+        picked = np.hypot(pick_dx, pick_dy).tolist()
+        objects = state.objects
+        targets = [objects[slot] for slot in enemies[pick].tolist()]
+        contacts = {slot: [(targets[i], picked[i], bearing[i])] for i, slot in enumerate(slots.tolist())}
+        for j, row in enumerate(rows[has_cone].tolist()):
+            contacts[slots.item(row)].append((targets[count + j], picked[count + j], bearing[count + j]))
+        self.contacts = contacts
+
+    def _update_contacts_scalar(self, state, alive):
+        # update_contacts の1組ずつ版（alive は編隊機ごとの生死のリスト）
+        enemies = self.track_enemy.tolist()
+        if not enemies or not any(alive):
+            self.contacts = {}
+            return
+        objects = state.objects
+        tracks = list(zip([objects[slot] for slot in enemies], self.track_x.tolist(), self.track_y.tolist()))
+        cone_cos2 = ATTACK_CONE_COS ** 2
+        contacts = {}
+        for aircraft, is_alive in zip(self.aircrafts, alive):
+            if not is_alive:
+                continue
+            mx, my = aircraft.x, aircraft.y
+            radians = math.radians(aircraft.direction)
+            cos, sin = math.cos(radians), math.sin(radians)
+            nearest = cone = None  # (距離の2乗, 敵機, dx, dy)
+            for enemy, tx, ty in tracks:
+                dx, dy = tx - mx, ty - my
+                distance2 = dx * dx + dy * dy
+                if nearest is None or distance2 < nearest[0]:
+                    nearest = (distance2, enemy, dx, dy)
+                ahead = dx * cos + dy * sin
+                if ahead > 0 and ahead * ahead > cone_cos2 * distance2 and (cone is None or distance2 < cone[0]):
+                    cone = (distance2, enemy, dx, dy)
+            picks = (nearest,) if cone is None or cone[1] is nearest[1] else (nearest, cone)
+            contacts[aircraft.slot] = [(enemy, math.hypot(dx, dy), math.degrees(math.atan2(dy, dx)) % 360)
+                                       for _, enemy, dx, dy in picks]
+        self.contacts = contacts
 
     def update(self):
         for aircraft in self.aircrafts:
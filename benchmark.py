@@ -0,0 +1,275 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from aircraft import ROE_WEAPONS_FREE, ROE_WEAPONS_HOLD
+from profiler import Profiler
+from simulation import (BASE_FPS, BLUE, RED, EDGE_MARGIN, FIRE_COOLDOWN, RADAR_FOV, RADAR_FREQUENCY, TEAM_BLUE,
+                        TEAM_RED, WIDTH, HEIGHT, World)
+from ut_commad_map import ChangeHeading, SetROE, SpawnWave
+
+# 標準の戦闘シナリオをヘッドレスで一定のシミュレーション時間だけ回し、速度とメモリを測るベンチマーク
+# 結果はベースラインファイルに保存しておき、後の実行で許容範囲を超えて遅く（重く）なったシナリオを報告する
+# 同じシードで同じ作業量になるので、Fighter.avoid_missile や move_missiles の変更前後をそのまま比べられる
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+DEFAULT_TOLERANCE = 0.15  # ベースラインからこの割合を超えて悪化したら回帰とみなす
+DEFAULT_REPEAT = 3  # 計測を繰り返して最速の回を採用する回数（ほかのプロセスの影響を減らすため）
+BASELINE_VERSION = 1
+SATURATION_BOX = 240  # ミサイル飽和シナリオで両チームを配置する中央の正方形の一辺（ピクセル）
+FRONT_GAP = 300  # 戦線シナリオで向かい合う両チームの戦線の間隔（レーダー範囲内、ピクセル）
+FRONT_SPREAD = 20  # 戦線の前後方向の位置のばらつき（ピクセル）
+
+# シナリオ（fighters_per_team: 1チームの機数、duration: シミュレーション時間（秒）、
+# scramble: 最初のティックで全機を発進させる、saturation: 全機を中央に集めて即座に撃てる状態にする、
+# front: 両チームをワールド中央でレーダー範囲内に向かい合う2本の戦線に並べる（基地から飛ぶと交戦まで数十秒かかる）、
+# radar_fov / radar_frequency: レーダーの視野角と走査周波数（省略時は simulation の既定値）、
+# triggers: 台本のコマンド数（増援・進路変更・交戦規定の切り替えを duration 中にばらまく）、
+# world_scale: ワールドの大きさ（既定の WIDTH x HEIGHT の何倍か））
+SCENARIOS = {
+    '3v3': {'fighters_per_team': 3, 'duration': 60, 'seed': 1},  # main.py と同じ設定
+    '30v30': {'fighters_per_team': 30, 'duration': 20, 'seed': 2, 'scramble': True, 'front': True},
+    '300v300': {'fighters_per_team': 300, 'duration': 5, 'seed': 3, 'scramble': True, 'front': True},
+    'saturation': {'fighters_per_team': 30, 'duration': 10, 'seed': 4, 'scramble': True, 'saturation': True},
+    'scripted': {'fighters_per_team': 30, 'duration': 20, 'seed': 5, 'scramble': True, 'front': True,
+                 'triggers': 600},
+    'theatre': {'fighters_per_team': 200, 'duration': 10, 'seed': 6, 'scramble': True, 'front': True,
+                'world_scale': 8},
+}
+
+# 回帰判定する指標と、悪化する向き（+1: 大きいほど悪い、-1: 小さいほど悪い）
+GATED_METRICS = {
+    'ticks_per_sec': -1,
+    'us_per_entity_tick': +1,
+    'peak_memory_mb': +1,
+}
+
+
+# シナリオの初期状態のワールドを作る
+def build_world(scenario):
+    scale = scenario.get('world_scale', 1)
+    world = World(scenario['fighters_per_team'], seed=scenario['seed'],
+                  radar_fov=scenario.get('radar_fov', RADAR_FOV),
+                  radar_frequency=scenario.get('radar_frequency', RADAR_FREQUENCY),
+                  width=WIDTH * scale, height=HEIGHT * scale)
+    if scenario.get('scramble'):
+        # 1秒おきのリスポーンを待たずに全機を基地から発進させる
+        for fighter in world.fighters:
+            fighter.respawn()
+    if scenario.get('saturation'):
+        # 中央の正方形にブルーは左半分、レッドは右半分に並べて向かい合わせ、発射インターバルも済ませておく
+        left, top = (world.width - SATURATION_BOX) / 2, (world.height - SATURATION_BOX) / 2
+        for fighter in world.fighters:
+            offset = 0 if fighter.team_color == BLUE else SATURATION_BOX / 2
+            fighter.x = left + offset + world.rng.uniform(0, SATURATION_BOX / 2)
+            fighter.y = top + world.rng.uniform(0, SATURATION_BOX)
+            fighter.direction = fighter.target_direction = 0 if fighter.team_color == BLUE else 180
+            fighter.last_fired_time = -FIRE_COOLDOWN
+    if scenario.get('front'):
+        # ブルーは中央の左、レッドは右に、ワールドの高さいっぱいの戦線を作って向かい合わせる
+        for fighter in world.fighters:
+            side = -1 if fighter.team_color == BLUE else 1
+            fighter.x = world.width / 2 + side * FRONT_GAP / 2 + world.rng.uniform(-FRONT_SPREAD, FRONT_SPREAD)
+            fighter.y = world.rng.uniform(EDGE_MARGIN * 2, world.height - EDGE_MARGIN * 2)
+            fighter.direction = fighter.target_direction = 0 if fighter.team_color == BLUE else 180
+    if scenario.get('triggers'):
+        schedule_exercise(world, scenario['triggers'], scenario['duration'], scenario['seed'])
+    world.fighter_state.load('target_direction', 'is_alive')
+    return world
+
+
+# 大規模演習の台本: 増援・進路変更・交戦規定の切り替えを triggers 件、ランダムな時刻に入れる
+def schedule_exercise(world, triggers, duration, seed):
+    rng = random.Random(seed)
+    for i in range(triggers):
+        team = rng.choice((TEAM_BLUE, TEAM_RED))
+        kind = i % 3
+        if kind == 0:
+            command = SpawnWave(team, rng.randint(1, 5))
+        elif kind == 1:
+            command = ChangeHeading(team, (rng.uniform(0, world.width), rng.uniform(0, world.height)))
+        else:
+            command = SetROE(team, rng.choice((ROE_WEAPONS_FREE, ROE_WEAPONS_HOLD)))
+        world.commands.add_command(command, rng.uniform(0, duration))
+
+
+# シナリオを1回実行して、経過時間とプロファイラを返す
+def run_timed(scenario):
+    world = build_world(scenario)
+    profiler = Profiler()
+    world.profiler = profiler
+    ticks = round(scenario['duration'] * BASE_FPS)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        world.step()
+        profiler.end_tick()
+    elapsed = time.perf_counter() - start
+    return elapsed, profiler, world
+
+
+# シナリオを1回実行して、Python のメモリ確保量のピーク（MB）を返す（tracemalloc は遅いので計測とは別に回す）
+def run_memory(scenario):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        world = build_world(scenario)
+        for _ in range(round(scenario['duration'] * BASE_FPS)):
+            world.step()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def run_scenario(name, repeat=DEFAULT_REPEAT, memory=True):
+    scenario = SCENARIOS[name]
+    best = None
+    for _ in range(repeat):
+        elapsed, profiler, world = run_timed(scenario)
+        if best is None or elapsed < best[0]:
+            best = (elapsed, profiler, world)
+    elapsed, profiler, world = best
+    # 交戦しないシナリオはミサイル関連の処理を測れない（python -O でも確かめるので assert は使わない）
+    if world.missiles_fired == 0:
+        raise RuntimeError(f"{name}: ミサイルが1発も発射されていません（両チームが交戦していない）")
+    summary = profiler.summary()
+    ticks = summary['ticks']
+    counters = summary['counters']
+    # 1ティックあたりの平均の実体数（生存している戦闘機 + 飛翔中のミサイル）
+    entities = counters['fighters_alive']['mean'] + counters['missiles_alive']['mean']
+    return {
+        'scenario': scenario,
+        'ticks': ticks,
+        'elapsed_s': elapsed,
+        'ticks_per_sec': ticks / elapsed,
+        'ms_per_tick': elapsed / ticks * 1000,
+        'us_per_entity_tick': elapsed / ticks / entities * 1e6 if entities else None,
+        'peak_memory_mb': run_memory(scenario) if memory else None,
+        'mean_fighters': counters['fighters_alive']['mean'],
+        'mean_missiles': counters['missiles_alive']['mean'],
+        'max_missiles': counters['missiles_alive']['max'],
+        # 作業量の目印（挙動が変わるとベースラインとの比較の前提が崩れる）
+        'workload': {'missiles_fired': world.missiles_fired, 'blue_kills': world.kills[BLUE],
+                     'red_kills': world.kills[RED]},
+        'phases_ms': {phase: stats['mean_ms'] for phase, stats in summary['phases'].items()
+                      if stats['total_s'] > 0},
+    }
+
+
+def environment():
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'system': platform.system()}
+
+
+# ベースラインと比べて、許容範囲を超えて悪化した指標のリストを返す
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    notes = []
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            notes.append(f"{name}: ベースラインに無いシナリオ")
+            continue
+        if base['scenario'] != result['scenario']:
+            notes.append(f"{name}: シナリオの設定がベースラインと異なるため比較しない")
+            continue
+        if base['workload'] != result['workload']:
+            notes.append(f"{name}: 作業量がベースラインと異なる {base['workload']} -> {result['workload']}")
+        for metric, worse in GATED_METRICS.items():
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change * worse > tolerance:
+                regressions.append({'scenario': name, 'metric': metric, 'baseline': old, 'current': new,
+                                    'change': change})
+    if baseline.get('environment') != environment():
+        notes.append(f"ベースラインの実行環境が異なる {baseline.get('environment')}")
+    return regressions, notes
+
+
+def print_results(results):
+    print(f"{'scenario':<12}{'ticks/s':>10}{'ms/tick':>10}{'us/ent':>9}{'fighters':>10}{'missiles':>10}{'fired':>8}"
+          f"{'peak MB':>9}")
+    for name, r in results.items():
+        per_entity = f"{r['us_per_entity_tick']:9.2f}" if r['us_per_entity_tick'] is not None else f"{'-':>9}"
+        memory = f"{r['peak_memory_mb']:9.2f}" if r['peak_memory_mb'] is not None else f"{'-':>9}"
+        print(f"{name:<12}{r['ticks_per_sec']:10.1f}{r['ms_per_tick']:10.3f}{per_entity}"
+              f"{r['mean_fighters']:10.1f}{r['mean_missiles']:10.1f}{r['workload']['missiles_fired']:8d}{memory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="標準シナリオのベンチマークと回帰チェック")
+    parser.add_argument('scenarios', nargs='*', help=f"実行するシナリオ {list(SCENARIOS)}（省略時はすべて）")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="計測の繰り返し回数（最速の回を採用）")
+    parser.add_argument('--no-memory', action='store_true', help="メモリのピーク計測を省略")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="ベースラインファイルのパス")
+    parser.add_argument('--save-baseline', action='store_true', help="今回の結果をベースラインとして保存")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="回帰とみなす悪化の割合（0.15 なら 15%%）")
+    parser.add_argument('--output', help="今回の結果を JSON で保存するパス")
+    args = parser.parse_args()
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"不明なシナリオ: {', '.join(unknown)}")
+    results = {}
+    for name in names:
+        try:
+            results[name] = run_scenario(name, args.repeat, not args.no_memory)
+        except RuntimeError as error:
+            print(f"エラー: {error}")
+            return 1
+    print_results(results)
+    report = {'version': BASELINE_VERSION, 'environment': environment(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        # 一部のシナリオだけを実行した場合は、既存のベースラインのほかのシナリオを残す
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            if baseline.get('version') == BASELINE_VERSION:
+                baseline['results'].update(results)
+                report['results'] = baseline['results']
+        except (OSError, ValueError):
+            pass
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"ベースラインを保存しました: {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except OSError:
+        print(f"ベースライン {args.baseline} が無いので比較しません（--save-baseline で作成）")
+        return 0
+    if baseline.get('version') != BASELINE_VERSION:
+        print("ベースラインの形式が古いので比較しません（--save-baseline で作り直してください）")
+        return 0
+
+    regressions, notes = find_regressions(results, baseline, args.tolerance)
+    for note in notes:
+        print(f"注意: {note}")
+    for r in regressions:
+        print(f"回帰: {r['scenario']} {r['metric']} {r['baseline']:.3f} -> {r['current']:.3f} "
+              f"({r['change']:+.1%})")
+    if regressions:
+        return 1
+    print(f"回帰なし（許容範囲 {args.tolerance:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import pygame
+
+# ビューアのカメラ（ワールド座標と画面座標の変換）
+# ワールドの大きさは画面と独立しているので、画面にはカメラが映す範囲だけを描く
+# center はカメラが映すワールド上の点（画面の中央に来る）、zoom は1ワールド単位あたりの画素数
+# 最小の zoom はワールド全体が画面に収まる倍率で、その倍率ではワールドの中央を映す
+# （既定の大きさのワールドを同じ大きさの画面で見ると、ワールド座標がそのまま画面座標になる）
+#
+# 操作: マウスホイール: カーソル位置を中心に拡大・縮小 / 右ドラッグ・中ドラッグ: パン
+#       W・A・S・D: パン / F: ワールド全体を表示
+
+ZOOM_STEP = 1.25  # マウスホイール1段の倍率
+MAX_ZOOM = 8.0  # 最大の拡大率（1ワールド単位あたりの画素数）
+PAN_STEP = 0.25  # W・A・S・D 1回のパンの量（画面の幅・高さに対する割合）
+PAN_KEYS = {pygame.K_a: (-1, 0), pygame.K_d: (1, 0), pygame.K_w: (0, -1), pygame.K_s: (0, 1)}
+DRAG_BUTTONS = (2, 3)  # パンに使うマウスボタン（左ボタンはビューアの操作に残す）
+
+
+class Camera:
+    def __init__(self, screen_size, world_size):
+        self.screen_width, self.screen_height = screen_size
+        self.world_width, self.world_height = world_size
+        self.min_zoom = min(self.screen_width / self.world_width, self.screen_height / self.world_height)
+        self.max_zoom = max(MAX_ZOOM, self.min_zoom)
+        self.dragging = False  # パンのドラッグ中か
+        self.fit()
+
+    def fit(self):
+        # ワールド全体を表示する
+        self.zoom = self.min_zoom
+        self.center_x, self.center_y = self.world_width / 2, self.world_height / 2
+
+    @property
+    def left(self):
+        # 画面の左上に映るワールド座標
+        return self.center_x - self.screen_width / 2 / self.zoom
+
+    @property
+    def top(self):
+        return self.center_y - self.screen_height / 2 / self.zoom
+
+    def state(self):
+        # 映している範囲が変わったかの判定用
+        return (self.center_x, self.center_y, self.zoom)
+
+    def _clamp(self):
+        # 画面がワールドの外を映しすぎないようにする（ワールドより広く映る方向は中央に置く）
+        for axis, size, extent in (('center_x', self.screen_width, self.world_width),
+                                   ('center_y', self.screen_height, self.world_height)):
+            half = size / 2 / self.zoom
+            if half * 2 >= extent:
+                setattr(self, axis, extent / 2)
+            else:
+                setattr(self, axis, min(max(getattr(self, axis), half), extent - half))
+
+    def to_screen(self, x, y):
+        # ワールド座標 → 画面座標（スカラーでも配列でもよい）
+        return (x - self.left) * self.zoom, (y - self.top) * self.zoom
+
+    def to_world(self, sx, sy):
+        return sx / self.zoom + self.left, sy / self.zoom + self.top
+
+    def visible(self, x, y, margin=0.0):
+        # ワールド座標の点 x, y（配列）が、画面の外側 margin 画素までに映るか
+        sx, sy = self.to_screen(x, y)
+        return ((sx >= -margin) & (sx <= self.screen_width + margin)
+                & (sy >= -margin) & (sy <= self.screen_height + margin))
+
+    def pan(self, dx, dy):
+        # 画面上で dx, dy 画素だけ映す範囲を動かす
+        self.center_x += dx / self.zoom
+        self.center_y += dy / self.zoom
+        self._clamp()
+
+    def zoom_at(self, factor, position):
+        # 画面上の position に映っているワールドの点を動かさずに拡大・縮小する
+        wx, wy = self.to_world(*position)
+        self.zoom = min(max(self.zoom * factor, self.min_zoom), self.max_zoom)
+        self.center_x = wx - (position[0] - self.screen_width / 2) / self.zoom
+        self.center_y = wy - (position[1] - self.screen_height / 2) / self.zoom
+        self._clamp()
+
+    def handle_event(self, event):
+        # カメラの操作なら処理して True を返す
+        if event.type == pygame.MOUSEWHEEL:
+            self.zoom_at(ZOOM_STEP ** event.y, pygame.mouse.get_pos())
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button in DRAG_BUTTONS:
+            self.dragging = True
+        elif event.type == pygame.MOUSEBUTTONUP and event.button in DRAG_BUTTONS:
+            self.dragging = False
+        elif event.type == pygame.MOUSEMOTION and self.dragging:
+            self.pan(-event.rel[0], -event.rel[1])
+        elif event.type == pygame.KEYDOWN and event.key in PAN_KEYS:
+            dx, dy = PAN_KEYS[event.key]
+            self.pan(dx * PAN_STEP * self.screen_width, dy * PAN_STEP * self.screen_height)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+            self.fit()
+        else:
+            return False
+        return True
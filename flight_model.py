@@ -0,0 +1,266 @@
+import math
+import sys
+from functools import cache
+
+import numpy as np
+
+from launch_envelope import LaunchEnvelope
+
+# 実単位（m, m/s, s）のミサイルと戦闘機の飛行モデル
+# 指示書どおり、ミサイルは発射機の速度から20秒間のロケットモーターでマッハ3〜4まで加速し、その後は慣性飛行で
+# 空気抵抗（速度の2乗に比例する有害抗力と、旋回の荷重に比例する誘導抗力）によってエネルギーを失う
+# 全機・全ミサイルの状態を配列で持ち、半陰的オイラー法（速度・方位を先に更新し、更新後の速度で位置を進める）で
+# まとめて積分する。1ステップは max_step 秒以下の小ステップに分けるので、粗い dt でも安定する
+# 空気は交戦高度（10000 m）の標準大気で一定とする
+# World(missile_model='flight') ではワールドのミサイルをこのモデルで飛ばし（simulation.move_missiles_flight）、
+# 発射の判断に実単位の発射可能範囲の表（launch_envelope）を使う。戦闘機の運動はワールドではピクセル単位のまま
+#   python flight_model.py で表を作り（キャッシュ済みなら読み込み）、目標速度・姿勢角ごとの Rmax と NEZ を表示し、
+#   姿勢角に対して Rmax が増えている格子点があればエラーとして終了コード 1 を返す
+
+GRAVITY = 9.80665  # 重力加速度（m/s²）
+AIR_DENSITY = 0.4135  # 高度 10000 m の空気密度（kg/m³）
+SPEED_OF_SOUND = 299.5  # 高度 10000 m の音速（m/s）
+
+# ミサイルのパラメータ（辞書なのでハッシュしてキャッシュの名前にできる）
+MISSILE_PARAMS = {
+    'launch_mass': 157.0,  # 発射時の質量（kg）
+    'burnout_mass': 110.0,  # 燃焼終了時の質量（kg）
+    'thrust': 5800.0,  # ロケットモーターの推力（N）
+    'burn_time': 20.0,  # 燃焼時間（s）
+    'reference_area': 0.0248,  # 基準面積（胴体断面, m²）
+    'cd0': 0.30,  # 有害抗力係数
+    'induced_drag': 0.05,  # 誘導抗力係数（Cdi = k * CL²）
+    'max_lift_coefficient': 15.0,  # 最大揚力係数（低速では荷重がこれで制限される）
+    'max_load': 30.0,  # 最大荷重（G）
+    'navigation_constant': 4.0,  # 比例航法の航法定数
+    'guidance_delay': 5.0,  # 発射から誘導を始めるまでの時間（s、その間は発射時の方位へ直進して加速する）
+    'lead_speed': 3 * SPEED_OF_SOUND,  # 発射時の見越し角を求めるときに仮定するミサイルの平均速度（m/s）
+    'min_speed': 200.0,  # これより遅くなると消滅する速度（m/s）
+    'max_flight_time': 180.0,  # 最大飛翔時間（s）
+    'lethal_radius': 15.0,  # 近接信管の作動半径（m）
+    'max_step': 0.05,  # 積分の最大刻み（s）
+}
+
+# 戦闘機のパラメータ
+FIGHTER_PARAMS = {
+    'mass': 15000.0,  # 質量（kg）
+    'max_thrust': 127000.0,  # 最大推力（N、アフターバーナー）
+    'wing_area': 27.9,  # 主翼面積（m²）
+    'cd0': 0.020,
+    'induced_drag': 0.12,
+    'max_lift_coefficient': 1.2,
+    'max_load': 7.0,  # 最大荷重（G、構造制限）
+    'cruise_speed': 0.8 * SPEED_OF_SOUND,  # 巡航速度（マッハ0.8）
+    'speed_gain': 0.5,  # 速度を指令値に合わせるスロットル制御のゲイン（1/s）
+    'max_step': 0.05,
+}
+
+
+# 速度と荷重（G）から抗力による減速度（m/s²）を求める
+# 抗力 = 動圧 × 面積 × (Cd0 + k CL²)、CL は荷重を支える揚力係数
+def drag_deceleration(speed, load, mass, area, cd0, induced_drag):
+    dynamic_pressure = np.maximum(0.5 * AIR_DENSITY * speed ** 2, 1e-6)
+    lift_coefficient = load * mass * GRAVITY / (dynamic_pressure * area)
+    return dynamic_pressure * area * (cd0 + induced_drag * lift_coefficient ** 2) / mass
+
+
+# 荷重の上限（G）: 構造の制限と、最大揚力係数で出せる揚力の小さい方（1G は下回らない）
+def available_load(speed, mass, area, max_lift_coefficient, max_load):
+    lift = 0.5 * AIR_DENSITY * speed ** 2 * area * max_lift_coefficient
+    return np.clip(lift / (mass * GRAVITY), 1, max_load)
+
+
+# 発射時のミサイルの方位（ラジアン）: 目標が等速直線運動を続けるとして、lead_speed で飛べば衝突する方位
+# 目標の速度の視線に直交する成分を打ち消す見越し角をとる（打ち消せないほど速ければ最大の 90 度）
+# 発射直後の遅いミサイルが視線の回転を追って大きな荷重で旋回し、加速のエネルギーを失うのを避ける
+def lead_heading(dx, dy, target_heading, target_speed, params=MISSILE_PARAMS):
+    bearing = np.arctan2(dy, dx)
+    crossing = target_speed * np.sin(target_heading - bearing) / params['lead_speed']
+    return bearing + np.arcsin(np.clip(crossing, -1, 1))
+
+
+# 方位差（ラジアン）を -π〜π に正規化する
+def wrap_angle(angle):
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+# 同じパラメータのミサイルの集まり（発射時に配列を確保し、積分中は全ミサイルを配列演算で進める）
+class MissileFlight:
+    def __init__(self, x, y, speed, heading, params=MISSILE_PARAMS):
+        self.params = params
+        self.x = np.array(x, dtype=np.float64)  # 位置（m）
+        self.y = np.array(y, dtype=np.float64)
+        n = len(self.x)
+        self.speed = np.broadcast_to(np.asarray(speed, dtype=np.float64), (n,)).copy()  # 速度（m/s）
+        self.heading = np.broadcast_to(np.asarray(heading, dtype=np.float64), (n,)).copy()  # 方位（ラジアン）
+        self.time = np.zeros(n)  # 発射からの経過時間（s）
+        self.load = np.ones(n)  # 荷重（G）
+        self.flying = np.ones(n, dtype=bool)  # 飛翔中か
+        self.hit = np.zeros(n, dtype=bool)  # 目標に近接信管の作動半径まで近づいたか
+        self.miss_distance = np.full(n, np.inf)  # 目標との最小距離（m）
+
+    def mass(self):
+        # 燃焼中は推進剤の消費で線形に軽くなる
+        p = self.params
+        burnt = np.minimum(self.time / p['burn_time'], 1)
+        return p['launch_mass'] - (p['launch_mass'] - p['burnout_mass']) * burnt
+
+    def step(self, dt, target_x, target_y, target_vx, target_vy):
+        # 目標（位置 m と速度 m/s、ミサイルごとの配列）へ比例航法で dt 秒だけ飛ばす
+        # 目標は小ステップの間は等速直線運動しているとみなす
+        p = self.params
+        substeps = max(math.ceil(dt / p['max_step'] - 1e-9), 1)
+        h = dt / substeps
+        target_x = np.asarray(target_x, dtype=np.float64)
+        target_y = np.asarray(target_y, dtype=np.float64)
+        target_vx = np.asarray(target_vx, dtype=np.float64)
+        target_vy = np.asarray(target_vy, dtype=np.float64)
+        for i in range(substeps):
+            tx, ty = target_x + target_vx * (i * h), target_y + target_vy * (i * h)
+            flying = self.flying
+            cos, sin = np.cos(self.heading), np.sin(self.heading)
+            rx, ry = tx - self.x, ty - self.y
+            vrx, vry = target_vx - self.speed * cos, target_vy - self.speed * sin
+            r2 = np.maximum(rx * rx + ry * ry, 1e-6)
+
+            # 純比例航法: 横加速度 = N × ミサイル速度 × 視線角速度（最大荷重で制限）
+            # 接近速度を使う真比例航法は、高速で離れていく目標（接近速度が負）を追うときに旋回しなくなる
+            los_rate = (rx * vry - ry * vrx) / r2
+            # 水平旋回なので、揚力は重力と横加速度の合成を支える（荷重 n なら横加速度は g √(n² - 1)）
+            mass = self.mass()
+            load = available_load(self.speed, mass, p['reference_area'], p['max_lift_coefficient'], p['max_load'])
+            max_lateral = GRAVITY * np.sqrt(load ** 2 - 1)
+            lateral = np.where(self.time < p['guidance_delay'], 0, p['navigation_constant'] * self.speed * los_rate)
+            lateral = np.clip(lateral, -max_lateral, max_lateral)
+            self.load = np.sqrt(1 + (lateral / GRAVITY) ** 2)
+
+            # 推力（燃焼中だけ）と抗力で速度を、横加速度で方位を更新してから、新しい速度で位置を進める
+            thrust = np.where(self.time < p['burn_time'], p['thrust'] / mass, 0)
+            drag = drag_deceleration(self.speed, self.load, mass, p['reference_area'], p['cd0'], p['induced_drag'])
+            speed = np.maximum(self.speed + (thrust - drag) * h, 0)
+            heading = self.heading + lateral / np.maximum(speed, 1.0) * h
+            self.speed = np.where(flying, speed, self.speed)
+            self.heading = np.where(flying, heading, self.heading)
+            step = np.where(flying, self.speed * h, 0)
+            self.x += step * np.cos(self.heading)
+            self.y += step * np.sin(self.heading)
+            self.time += np.where(flying, h, 0)
+
+            # 小ステップ内の目標との最接近距離（相対位置は線形に変わるとみなす）と消滅条件
+            ex, ey = tx + target_vx * h - self.x, ty + target_vy * h - self.y
+            dx, dy = ex - rx, ey - ry
+            along = np.clip(-(rx * dx + ry * dy) / np.maximum(dx * dx + dy * dy, 1e-12), 0, 1)
+            distance = np.hypot(rx + dx * along, ry + dy * along)
+            self.miss_distance = np.where(flying, np.minimum(self.miss_distance, distance), self.miss_distance)
+            self.hit |= flying & (distance < p['lethal_radius'])
+            self.flying = flying & ~self.hit & (self.speed >= p['min_speed']) & (self.time < p['max_flight_time'])
+
+
+# 同じパラメータの戦闘機の集まり（指令された方位と速度へ、荷重と推力の制限の中で向かう）
+class FighterFlight:
+    def __init__(self, x, y, heading, speed=None, params=FIGHTER_PARAMS):
+        self.params = params
+        self.x = np.array(x, dtype=np.float64)
+        self.y = np.array(y, dtype=np.float64)
+        n = len(self.x)
+        speed = params['cruise_speed'] if speed is None else speed
+        self.speed = np.broadcast_to(np.asarray(speed, dtype=np.float64), (n,)).copy()
+        self.heading = np.broadcast_to(np.asarray(heading, dtype=np.float64), (n,)).copy()
+        self.load = np.ones(n)
+
+    def velocity(self):
+        return self.speed * np.cos(self.heading), self.speed * np.sin(self.heading)
+
+    def step(self, dt, heading_command, speed_command=None, max_load=None):
+        # 指令方位へ最大荷重（機体ごとに下げられる）の旋回率で向き、指令速度へスロットルで合わせる
+        p = self.params
+        speed_command = p['cruise_speed'] if speed_command is None else speed_command
+        max_load = p['max_load'] if max_load is None else np.minimum(max_load, p['max_load'])
+        substeps = max(math.ceil(dt / p['max_step'] - 1e-9), 1)
+        h = dt / substeps
+        for _ in range(substeps):
+            # 出せる荷重での旋回率 ω = g √(n² - 1) / v
+            speed = np.maximum(self.speed, 1.0)
+            load = available_load(speed, p['mass'], p['wing_area'], p['max_lift_coefficient'], max_load)
+            max_rate = GRAVITY * np.sqrt(load ** 2 - 1) / speed
+            turn = np.clip(wrap_angle(heading_command - self.heading), -max_rate * h, max_rate * h)
+            rate = turn / h
+            self.load = np.sqrt(1 + (speed * rate / GRAVITY) ** 2)
+
+            # 推力は抗力を打ち消したうえで速度差に比例させ、0〜最大推力に制限する
+            drag = drag_deceleration(self.speed, self.load, p['mass'], p['wing_area'], p['cd0'], p['induced_drag'])
+            thrust = np.clip(drag + p['speed_gain'] * (speed_command - self.speed), 0, p['max_thrust'] / p['mass'])
+            self.speed = np.maximum(self.speed + (thrust - drag) * h, 0)
+            self.heading = wrap_angle(self.heading + turn)
+            self.x += self.speed * np.cos(self.heading) * h
+            self.y += self.speed * np.sin(self.heading) * h
+
+
+# 実単位の発射可能範囲の表のパラメータ（ミサイル・戦闘機のパラメータも含めてハッシュし、キャッシュの名前にする）
+MODEL_VERSION = 2  # 運動の計算（誘導則など）を変えたら上げる（古い表を使わないため）
+ENVELOPE_FRAME_TIME = 0.5  # 表を作るときの1フレームの秒数（積分はさらに max_step 秒以下に分ける）
+ENVELOPE_PARAMS = {
+    'model_version': MODEL_VERSION,
+    'frame_time': ENVELOPE_FRAME_TIME,
+    'max_range': 160000.0,  # 射程の格子の上限（m）
+    'max_target_speed': 2 * SPEED_OF_SOUND,  # 目標速度の格子の上限（m/s）
+    'max_frames': math.ceil(MISSILE_PARAMS['max_flight_time'] / ENVELOPE_FRAME_TIME),
+    'missile': MISSILE_PARAMS,
+    'fighter': FIGHTER_PARAMS,
+}
+
+
+# LaunchEnvelope.build に渡す飛行（simulation.simulate_launches の実単位版）
+# 発射機は原点で +x 方向へ巡航速度で飛んでおり、目標は +x 方向の distance（m）の位置。ミサイルは見越し角をとって発射する
+# 目標は姿勢角 aspect（度）の機首方向へ target_speed（m/s）で直進するか、
+# evasive なら発射と同時に発射機から真っすぐ離れる方向（+x）へ旋回して逃げる。戻り値は組ごとに命中したか
+def simulate_launches(distance, aspect, target_speed, evasive, max_frames):
+    n = len(distance)
+    heading = np.radians(180 + np.asarray(aspect, dtype=np.float64))
+    launch = lead_heading(np.asarray(distance, dtype=np.float64), np.zeros(n), heading, target_speed)
+    missiles = MissileFlight(np.zeros(n), np.zeros(n), FIGHTER_PARAMS['cruise_speed'], launch)
+    targets = FighterFlight(distance, np.zeros(n), heading, target_speed)
+    command = np.zeros(n) if evasive else heading
+    for _ in range(max_frames):
+        vx, vy = targets.velocity()
+        missiles.step(ENVELOPE_FRAME_TIME, targets.x, targets.y, vx, vy)
+        targets.step(ENVELOPE_FRAME_TIME, command, target_speed)
+        if not missiles.flying.any():
+            break
+    return missiles.hit
+
+
+# 実単位の発射可能範囲の表（キャッシュが無ければ作る）
+@cache
+def launch_envelope():
+    return LaunchEnvelope.load(ENVELOPE_PARAMS, simulate_launches)
+
+
+def print_table(title, envelope, table):
+    print(title)
+    print("目標速度 \\ 姿勢角" + "".join(f"{aspect:7.0f}" for aspect in envelope.aspects))
+    for j, speed in enumerate(envelope.speeds):
+        print(f"{speed:6.0f} m/s（M{speed / SPEED_OF_SOUND:.1f}）" + "".join(f"{r / 1000:7.1f}" for r in table[:, j]))
+
+
+# 姿勢角が大きくなる（正面から後方へ回る）ほど目標は逃げる向きになるので、Rmax は増えないはず
+# 増えている格子点（目標速度, 姿勢角, その手前の姿勢角での Rmax, Rmax）の一覧を返す（空なら正常）
+def rmax_violations(envelope):
+    rmax = envelope.rmax
+    return [(envelope.speeds[j], envelope.aspects[i + 1], rmax[i, j], rmax[i + 1, j])
+            for i, j in zip(*np.nonzero(rmax[1:] > rmax[:-1]))]
+
+
+def main():
+    envelope = launch_envelope()
+    print_table("直進する目標に届く最大射程 Rmax（km）", envelope, envelope.rmax)
+    print_table("逃げる目標にも命中する最大射程 NEZ（km）", envelope, envelope.nez)
+    violations = rmax_violations(envelope)
+    for speed, aspect, previous, rmax in violations:
+        print(f"エラー: 目標速度 {speed:.0f} m/s・姿勢角 {aspect:.0f} 度で Rmax が増えています"
+              f"（{previous / 1000:.1f} → {rmax / 1000:.1f} km）")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
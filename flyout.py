@@ -0,0 +1,95 @@
+import numpy as np
+
+from table_cache import CACHE_DIR, load_table
+
+# ミサイルのフライアウト表
+# 経過フレーム数と現在速度から、一定時間内に到達できる距離と飛翔できる時間を引く表を作る
+# 加速・空気抵抗・旋回損失・最低速度での消滅はミサイルの移動処理と同じ1フレームごとの式で積分する
+# 表はパラメータのハッシュを名前にしてディスクにキャッシュし（table_cache）、定数が変われば自動で作り直す
+
+TABLE_VERSION = 1  # 表の作り方を変えたら上げる（古いキャッシュを使わないため）
+AGE_STEPS = 91  # 経過フレーム数の格子点数（0 〜 加速時間）
+SPEED_STEPS = 121  # 速度の格子点数（0 〜 最大速度）
+TABLE_LAYOUT = {'version': TABLE_VERSION, 'ages': AGE_STEPS, 'speeds': SPEED_STEPS}
+TABLE_ARRAYS = ('ages', 'speeds', 'reach', 'flight_frames')
+
+
+class FlyoutTable:
+    def __init__(self, params, ages, speeds, reach, flight_frames):
+        self.params = params
+        self.ages = ages  # 経過フレーム数の格子
+        self.speeds = speeds  # 速度の格子
+        self.reach = reach  # [age, speed] 到達距離
+        self.flight_frames = flight_frames  # [age, speed] 消滅するか horizon に達するまでのフレーム数
+        # ミサイル1発分を引く場合はリストで引く（スカラーの NumPy 演算は遅い）
+        self._reach = reach.tolist()
+        self._flight_frames = flight_frames.tolist()
+        self._ages = (float(ages[0]), float(ages[-1]), float(ages[1] - ages[0]))  # 格子の最初・最後・間隔
+        self._speeds = (float(speeds[0]), float(speeds[-1]), float(speeds[1] - speeds[0]))
+
+    @staticmethod
+    def build(params):
+        # 全格子点のミサイルを horizon フレーム分まとめて飛ばす（戻り値は TABLE_ARRAYS の配列の辞書）
+        accel_time = params['acceleration_time']
+        ages = np.linspace(0, accel_time, AGE_STEPS)
+        speeds = np.linspace(0, params['max_speed'], SPEED_STEPS)
+        age, speed = np.meshgrid(ages, speeds, indexing='ij')
+        age, speed = age.copy(), speed.copy()
+        reach = np.zeros_like(speed)
+        flight_frames = np.zeros_like(speed)
+        flying = np.ones(speed.shape, dtype=bool)
+        for _ in range(params['horizon_frames']):
+            boost = np.clip(accel_time - age, 0, 1)
+            coast = 1 - boost
+            age += 1
+            speed = np.minimum(speed + params['acceleration_rate'] * boost, params['max_speed'])
+            speed = np.where(coast > 0,
+                             np.maximum(speed - (params['drag'] * speed ** 2 + params['turn_energy_loss']) * coast, 0),
+                             speed)
+            # 消滅するフレームの移動までは含める
+            reach += np.where(flying, speed, 0)
+            flight_frames += flying
+            flying &= speed >= params['min_speed']
+        return {'ages': ages, 'speeds': speeds, 'reach': reach, 'flight_frames': flight_frames}
+
+    @classmethod
+    def load(cls, params, cache_dir=CACHE_DIR):
+        # パラメータが同じ表がキャッシュにあれば読み込み、なければ作って保存する
+        return cls(params, **load_table('flyout', params, TABLE_LAYOUT, TABLE_ARRAYS, lambda: cls.build(params),
+                                        cache_dir))
+
+    def _interpolate(self, table, age, speed):
+        # 双線形補間（格子の外は端の値）
+        age = np.clip(np.asarray(age, dtype=np.float64), self.ages[0], self.ages[-1])
+        speed = np.clip(np.asarray(speed, dtype=np.float64), self.speeds[0], self.speeds[-1])
+        fa = (age - self.ages[0]) / (self.ages[1] - self.ages[0])
+        fs = (speed - self.speeds[0]) / (self.speeds[1] - self.speeds[0])
+        i = np.minimum(fa.astype(np.intp), len(self.ages) - 2)
+        j = np.minimum(fs.astype(np.intp), len(self.speeds) - 2)
+        ta, ts = fa - i, fs - j
+        return ((table[i, j] * (1 - ts) + table[i, j + 1] * ts) * (1 - ta)
+                + (table[i + 1, j] * (1 - ts) + table[i + 1, j + 1] * ts) * ta)
+
+    def _interpolate_scalar(self, table, age, speed):
+        # _interpolate の1点版（age と speed は Python のスカラー）
+        age_first, age_last, age_step = self._ages
+        speed_first, speed_last, speed_step = self._speeds
+        fa = (min(max(age, age_first), age_last) - age_first) / age_step
+        fs = (min(max(speed, speed_first), speed_last) - speed_first) / speed_step
+        i = min(int(fa), AGE_STEPS - 2)
+        j = min(int(fs), SPEED_STEPS - 2)
+        ta, ts = fa - i, fs - j
+        return ((table[i][j] * (1 - ts) + table[i][j + 1] * ts) * (1 - ta)
+                + (table[i + 1][j] * (1 - ts) + table[i + 1][j + 1] * ts) * ta)
+
+    def reach_distance(self, age, speed):
+        # horizon 以内に到達できる距離（ピクセル）。age と speed がスカラーなら Python の float を返す
+        if isinstance(age, (int, float)) and isinstance(speed, (int, float)):
+            return self._interpolate_scalar(self._reach, age, speed)
+        return self._interpolate(self.reach, age, speed)
+
+    def flight_time(self, age, speed):
+        # horizon 以内で飛翔を続けられる時間（フレーム）。age と speed がスカラーなら Python の float を返す
+        if isinstance(age, (int, float)) and isinstance(speed, (int, float)):
+            return self._interpolate_scalar(self._flight_frames, age, speed)
+        return self._interpolate(self.flight_frames, age, speed)
@@ -0,0 +1,100 @@
+import numpy as np
+
+from table_cache import CACHE_DIR, load_table
+
+# ミサイルの発射可能範囲（WEZ）の表
+# 射程・目標の姿勢角（aspect）・目標速度の格子点ごとに、ミサイルと目標の組をまとめて飛ばし、
+# 直進する目標に届く最大射程 Rmax と、目標が発射と同時に背を向けて逃げても命中する射程の帯（No Escape Zone, NEZ）を作る
+# 旋回率の限られたミサイルは途中の射程で外れることがある（射程の内側にも穴がある）ので、
+# NEZ は逃げる目標にも直進する目標にも命中し続ける射程のうち、最も遠い帯（内側の端 nez_min 〜 外側の端 nez）とする
+# 直進する目標に命中することも条件に入れるので、どの格子点でも nez <= rmax になる
+# 発射の判断は NEZ で行う（AI の戦闘機は撃たれると回避するので、Rmax で撃ったミサイルの多くは届かずに消滅する）
+# 飛ばす処理は呼び出し側（simulation.simulate_launches）から渡すので、表はシミュレーションと同じ運動で作られる
+# 表はパラメータのハッシュを名前にしてディスクに置き（table_cache）、発射の判断では補間で引くだけにする
+#
+# aspect は目標の機首方向と「目標から見た発射機の方位」の差（0 度: 正面から向かってくる、180 度: 真後ろから追う）
+
+TABLE_VERSION = 2  # 表の作り方を変えたら上げる
+RANGE_STEPS = 121  # 射程の格子点数（0 〜 max_range）
+ASPECT_STEPS = 13  # 姿勢角の格子点数（0 〜 180 度、15 度刻み）
+SPEED_STEPS = 5  # 目標速度の格子点数（0 〜 max_target_speed）
+TABLE_LAYOUT = {'version': TABLE_VERSION, 'ranges': RANGE_STEPS, 'aspects': ASPECT_STEPS, 'speeds': SPEED_STEPS}
+TABLE_ARRAYS = ('ranges', 'aspects', 'speeds', 'rmax', 'nez_min', 'nez')
+
+
+# 射程の格子に沿った命中（[..., range] の bool 配列）から、最も遠い命中の帯の内側の端と外側の端の射程を求める
+# 1点も命中しなければどちらも 0
+def farthest_band(ranges, hit):
+    steps = hit.shape[-1]
+    index = np.arange(steps)
+    outer = np.where(hit, index, -1).max(axis=-1)
+    # 外側の端より手前で最後に外れた格子点の次が内側の端
+    inner = np.where(~hit & (index < outer[..., None]), index, -1).max(axis=-1) + 1
+    found = outer >= 0
+    return np.where(found, ranges[inner], 0.0), np.where(found, ranges[np.maximum(outer, 0)], 0.0)
+
+
+class LaunchEnvelope:
+    def __init__(self, params, ranges, aspects, speeds, rmax, nez_min, nez):
+        self.params = params
+        self.ranges = ranges  # 射程の格子
+        self.aspects = aspects  # 姿勢角の格子（度）
+        self.speeds = speeds  # 目標速度の格子
+        self.rmax = rmax  # [aspect, speed] 直進する目標に届く最大射程（届かなければ 0）
+        self.nez_min = nez_min  # [aspect, speed] NEZ の内側の端（これより近いと逃げる目標に外れることがある）
+        self.nez = nez  # [aspect, speed] NEZ の外側の端（逃げる目標にも命中する最大射程、rmax 以下）
+        # 発射の判断は1機ずつなので、配列ではなくリストで引く（スカラーの NumPy 演算は遅い）
+        self._rmax = rmax.tolist()
+        self._nez_min = nez_min.tolist()
+        self._nez = nez.tolist()
+        self._aspect_step = float(aspects[1] - aspects[0])
+        self._speed_step = float(speeds[1] - speeds[0])
+
+    @staticmethod
+    def build(params, simulate):
+        # simulate(distance, aspect, target_speed, evasive, max_frames) は組ごとの命中（bool 配列）を返す
+        # evasive なら目標は発射と同時に発射機から真っすぐ離れる方向へ旋回して逃げる
+        # 戻り値は TABLE_ARRAYS の配列の辞書
+        ranges = np.linspace(0, params['max_range'], RANGE_STEPS)
+        aspects = np.linspace(0, 180, ASPECT_STEPS)
+        speeds = np.linspace(0, params['max_target_speed'], SPEED_STEPS)
+        aspect, speed, distance = np.meshgrid(aspects, speeds, ranges, indexing='ij')
+        straight, evasive = (simulate(distance.ravel(), aspect.ravel(), speed.ravel(), evasive,
+                                      params['max_frames']).reshape(distance.shape) for evasive in (False, True))
+        _, rmax = farthest_band(ranges, straight)
+        nez_min, nez = farthest_band(ranges, straight & evasive)
+        return {'ranges': ranges, 'aspects': aspects, 'speeds': speeds, 'rmax': rmax, 'nez_min': nez_min, 'nez': nez}
+
+    @classmethod
+    def load(cls, params, simulate, cache_dir=CACHE_DIR):
+        # 同じパラメータの表がキャッシュにあれば読み込み、なければ作って保存する
+        return cls(params, **load_table('envelope', params, TABLE_LAYOUT, TABLE_ARRAYS,
+                                        lambda: cls.build(params, simulate), cache_dir))
+
+    def _interpolate(self, table, aspect, speed):
+        # 姿勢角と目標速度の双線形補間（格子の外は端の値）
+        fa = min(max(aspect, 0.0), 180.0) / self._aspect_step
+        fs = min(max(speed / self._speed_step, 0.0), SPEED_STEPS - 1)
+        i = min(int(fa), ASPECT_STEPS - 2)
+        j = min(int(fs), SPEED_STEPS - 2)
+        ta, ts = fa - i, fs - j
+        return ((table[i][j] * (1 - ts) + table[i][j + 1] * ts) * (1 - ta)
+                + (table[i + 1][j] * (1 - ts) + table[i + 1][j + 1] * ts) * ta)
+
+    def max_range(self, aspect, target_speed):
+        # 直進する目標に届く最大射程 Rmax
+        return self._interpolate(self._rmax, aspect, target_speed)
+
+    def no_escape_range(self, aspect, target_speed):
+        # 逃げる目標にも命中する射程の帯（内側の端, 外側の端）
+        return self._interpolate(self._nez_min, aspect, target_speed), self._interpolate(self._nez, aspect, target_speed)
+
+    def in_no_escape_zone(self, distance, aspect, target_speed):
+        # 射程 distance が NEZ の中か（逃げられても命中する位置か）
+        nearest, farthest = self.no_escape_range(aspect, target_speed)
+        return 0 < farthest and nearest <= distance <= farthest
+
+
+# 目標の機首方向と、目標から発射機への方位（度）から姿勢角（0 〜 180 度）を求める
+def aspect_angle(target_direction, bearing_to_shooter):
+    return abs((target_direction - bearing_to_shooter + 180) % 360 - 180)
@@ -0,0 +1,219 @@
+import argparse
+import time
+from multiprocessing import Process, shared_memory
+
+import numpy as np
+
+from replay import (EXPLOSION_DTYPE, FIGHTER_DTYPE, MISSILE_DTYPE, TICK_DTYPE, explosion_views, fighter_views,
+                    fill_records, missile_views)
+from simulation import BASE_FPS, HEIGHT, MAX_MISSILES, WIDTH, World, calculate_missile_sector
+
+# シミュレーションを別プロセスで動かし、ティックごとの状態を共有メモリのリングバッファへ書き出して、
+# pygame のビューアが自分のフレームレートで最新の状態だけを読んで描くライブ表示
+# 描画が遅くてもシミュレーションは止まらず、間に合わなかったティックは描かずに捨てる
+#
+# 共有メモリの構成
+#   制御ブロック: int64 × (CONTROL_SIZE + スロット数)（最新のスロット・読み手が使用中のスロット・書いたフレーム数・
+#                 停止要求・スロットごとの書き込み回数）
+#   スロット × RING_SLOTS: TICK_DTYPE 1件 + FIGHTER_DTYPE × 戦闘機数 + MISSILE_DTYPE × 上限 + EXPLOSION_DTYPE × 上限
+#   （レコードの形式はリプレイファイルと同じ）
+#
+# 読み手は最新のスロットを「使用中」にしてから、共有メモリ上のビューをそのまま描画に使う（コピーしない）
+# 書き手は使用中のスロットを飛ばして書くので、描画中のフレームが書き換えられることはない
+# スロットの書き込み回数は書き込み中だけ奇数になり、読み手は偶数のスロットだけを使う
+
+RING_SLOTS = 8  # リングバッファのスロット数（読み手が使用中の1つを除いて書き手が循環する）
+LATEST, PINNED, PUBLISHED, STOP = range(4)  # 制御ブロックの添字
+CONTROL_SIZE = 4
+FPS = BASE_FPS  # ビューアの描画フレームレート
+OVERLAY_POSITION = (10, 10)
+
+
+class FrameRing:
+    def __init__(self, n_fighters, slots=RING_SLOTS, name=None):
+        # name を省略すると共有メモリを作り、指定すると既存の共有メモリにつなぐ
+        self.n_fighters = n_fighters
+        self.slots = slots
+        self.max_missiles = n_fighters * MAX_MISSILES  # 1機が同時に飛ばせるミサイル数の上限から決まる
+        self.max_explosions = n_fighters  # 爆発はリスポーンより早く消えるので、1機につき最大1つ
+        self.slot_bytes = (TICK_DTYPE.itemsize + n_fighters * FIGHTER_DTYPE.itemsize
+                           + self.max_missiles * MISSILE_DTYPE.itemsize + self.max_explosions * EXPLOSION_DTYPE.itemsize)
+        control_bytes = (CONTROL_SIZE + slots) * 8
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=control_bytes + slots * self.slot_bytes)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        buffer = self.memory.buf
+        self.control = np.ndarray(CONTROL_SIZE + slots, dtype=np.int64, buffer=buffer)
+        self.sequence = self.control[CONTROL_SIZE:]  # スロットごとの書き込み回数（書き込み中は奇数）
+        if name is None:
+            self.control[:] = 0
+            self.control[LATEST] = self.control[PINNED] = -1
+
+        # スロットごとのレコード配列（共有メモリ上のビュー）
+        self.records = []
+        offset = control_bytes
+        for _ in range(slots):
+            views = []
+            for dtype, count in ((TICK_DTYPE, 1), (FIGHTER_DTYPE, n_fighters),
+                                 (MISSILE_DTYPE, self.max_missiles), (EXPLOSION_DTYPE, self.max_explosions)):
+                views.append(np.ndarray(count, dtype=dtype, buffer=buffer, offset=offset))
+                offset += count * dtype.itemsize
+            self.records.append(views)
+        self.cursor = 0  # 書き手が次に書くスロットの候補
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def publish(self, world):
+        # 書き手: ワールドの現在の状態を、読み手が使用中でないスロットへ書いて最新にする
+        control, sequence = self.control, self.sequence
+        while True:
+            slot = self.cursor % self.slots
+            self.cursor += 1
+            if slot == control[PINNED]:
+                continue
+            sequence[slot] += 1  # 書き込み中（奇数）
+            if slot != control[PINNED]:
+                break
+            sequence[slot] -= 1  # 印を付ける間に読み手が使い始めたので、別のスロットにする
+        header, fighters, missiles, explosions = self.records[slot]
+        fill_records(world, header, fighters, missiles[:min(world.missile_state.count, self.max_missiles)],
+                     explosions[:min(len(world.explosions), self.max_explosions)])
+        sequence[slot] += 1  # 書き込み完了（偶数）
+        control[LATEST] = slot
+        control[PUBLISHED] += 1
+
+    def acquire(self):
+        # 読み手: 最新のスロットを使用中にして返す（まだ1フレームも無ければ None）
+        # 次に acquire するまで、そのスロットは書き換えられない
+        control, sequence = self.control, self.sequence
+        while True:
+            slot = int(control[LATEST])
+            if slot < 0:
+                return None
+            control[PINNED] = slot
+            if sequence[slot] % 2 == 0:
+                return slot
+            # 使用中にする直前に書き込みが始まっていた（すぐ終わるので最新を取り直す）
+
+    def frame(self, slot):
+        # スロットのレコード（件数の分だけのビュー）
+        header, fighters, missiles, explosions = self.records[slot]
+        return (header[0], fighters, missiles[:int(header[0]['n_missiles'])],
+                explosions[:int(header[0]['n_explosions'])])
+
+    def published(self):
+        return int(self.control[PUBLISHED])
+
+    def request_stop(self):
+        self.control[STOP] = 1
+
+    def stop_requested(self):
+        return bool(self.control[STOP])
+
+    def close(self):
+        # ビューを捨ててから共有メモリを閉じる（ビューが残っていると閉じられない）
+        self.records = self.control = self.sequence = None
+        self.memory.close()
+
+
+# ワーカープロセス: ワールドを進めてティックごとにリングバッファへ書き出す
+# time_scale 倍の実時間に合わせて進める（0 なら待たずに全速で進める）。何も起きない巡航区間は早送りする
+def simulate(name, n_fighters, fighters_per_team, seed, time_scale, world_size=(WIDTH, HEIGHT)):
+    ring = FrameRing(n_fighters, name=name)
+    world = World(fighters_per_team, seed=seed, width=world_size[0], height=world_size[1])
+    start = time.perf_counter()
+    try:
+        ring.publish(world)
+        while not ring.stop_requested() and not world.finished:
+            if time_scale > 0:
+                # 実時間で到達しているティックまで進める（先行していれば待つ）
+                due = int((time.perf_counter() - start) * time_scale / world.clock.dt) - world.tick
+                if due <= 0:
+                    time.sleep(world.clock.dt / time_scale)
+                    continue
+                world.fast_forward(due - 1)
+            else:
+                world.fast_forward(BASE_FPS)
+            world.step()
+            ring.publish(world)
+    finally:
+        ring.close()
+
+
+# ビューア: ワーカーを起動し、最新のフレームだけを描画する
+# カメラの操作は camera.py（ホイール: 拡大・縮小 / 右ドラッグ・W・A・S・D: パン / F: 全体）
+def view(fighters_per_team=3, seed=None, time_scale=1.0, world_scale=1):
+    import pygame
+    from camera import Camera
+    from renderer import BLACK, Renderer
+
+    n_fighters = fighters_per_team * 2
+    world_size = (WIDTH * world_scale, HEIGHT * world_scale)
+    ring = FrameRing(n_fighters)
+    worker = Process(target=simulate, args=(ring.name, n_fighters, fighters_per_team, seed, time_scale, world_size),
+                     daemon=True)
+    worker.start()
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("AIによる自動戦闘シミュレーション（ライブ）")
+    font = pygame.font.Font(None, 24)
+    clock = pygame.time.Clock()
+    renderer = Renderer(screen)
+    camera = Camera((WIDTH, HEIGHT), world_size)
+    drawn = 0  # 描いたフレーム数
+    previous = 0  # 前回の描画までに書かれたフレーム数
+    dropped = 0  # 描かずに捨てたフレーム数
+    run = True
+
+    try:
+        while run:
+            clock.tick(FPS)
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    run = False
+                else:
+                    camera.handle_event(event)
+            if not worker.is_alive() and ring.published() == previous:
+                run = False  # シナリオが終わり、最後のフレームも描いた
+
+            published = ring.published()
+            slot = ring.acquire()
+            if slot is None:
+                continue
+            if published > previous:
+                dropped += published - previous - 1 if drawn else 0
+                drawn += 1
+                previous = published
+            header, fighters, missiles, explosions = ring.frame(slot)
+
+            def overlay(screen):
+                text = (f"{int(header['tick']) / BASE_FPS:7.1f}s  BLUE {int(header['blue_kills'])}"
+                        f" - RED {int(header['red_kills'])}  描画 {drawn}  破棄 {dropped}  {clock.get_fps():.0f} fps")
+                return [screen.blit(font.render(text, True, BLACK), OVERLAY_POSITION)]
+
+            renderer.draw(fighter_views(fighters), missile_views(missiles), calculate_missile_sector,
+                          explosion_views(explosions), overlay, camera)
+    finally:
+        ring.request_stop()
+        worker.join()
+        ring.close()
+        ring.memory.unlink()
+        pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="別プロセスのシミュレーションをライブ表示する")
+    parser.add_argument('--fighters', type=int, default=3, help="1チームあたりの戦闘機数")
+    parser.add_argument('--seed', type=int, default=None, help="乱数シード")
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help="シミュレーションを実時間の何倍で進めるか（0 なら描画と無関係に全速）")
+    parser.add_argument('--world-scale', type=float, default=1, help="ワールドの大きさ（画面 1280x720 の何倍か）")
+    args = parser.parse_args()
+    view(args.fighters, args.seed, args.time_scale, args.world_scale)
+
+if __name__ == "__main__":
+    main()
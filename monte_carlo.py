@@ -0,0 +1,95 @@
+import argparse
+import json
+import math
+import statistics
+from functools import partial
+from multiprocessing import Pool
+
+from simulation import AI_TRANSIT_INTERVAL, BASE_FPS, BLUE, MISSILE_MODELS, RED, RADAR_FOV, RADAR_FREQUENCY, World
+
+# シード付きのヘッドレス戦闘を多数回まわして結果を集計するバッチランナー
+
+DEFAULT_DURATION = 300  # 1回の戦闘のシミュレーション時間（秒）
+Z_95 = 1.959964  # 95%信頼区間の z 値
+
+# 1回分の戦闘を実行して結果を返す（同じシードなら同じ結果になる）
+def run_engagement(seed, duration=DEFAULT_DURATION, fighters_per_team=3, dt=1 / BASE_FPS, time_skip=True,
+                   radar_fov=RADAR_FOV, radar_frequency=RADAR_FREQUENCY, ai_interval=AI_TRANSIT_INTERVAL,
+                   missile_model='pixel'):
+    world = World(fighters_per_team, seed=seed, dt=dt, radar_fov=radar_fov, radar_frequency=radar_frequency,
+                  ai_interval=ai_interval, missile_model=missile_model)
+    world.run_for(duration, time_skip)
+    return {
+        'seed': seed,
+        'blue_kills': world.kills[BLUE],
+        'red_kills': world.kills[RED],
+        'missiles_fired': world.missiles_fired,
+        'missiles_expired': world.missiles_expired,
+        'time_to_first_kill': world.first_kill_time,
+    }
+
+# 平均と正規近似による95%信頼区間を計算
+def confidence_interval(values):
+    n = len(values)
+    if n == 0:
+        return {'n': 0, 'mean': None, 'stdev': None, 'ci95': None}
+    mean = statistics.fmean(values)
+    stdev = statistics.stdev(values) if n > 1 else 0.0
+    half_width = Z_95 * stdev / math.sqrt(n)
+    return {'n': n, 'mean': mean, 'stdev': stdev, 'ci95': (mean - half_width, mean + half_width)}
+
+# 全試行の結果を項目ごとに集計
+def aggregate(results):
+    summary = {'runs': len(results)}
+    for key in ('blue_kills', 'red_kills', 'missiles_fired', 'missiles_expired', 'time_to_first_kill'):
+        # 撃墜が起きなかった試行の初撃墜時間は除外する
+        values = [r[key] for r in results if r[key] is not None]
+        summary[key] = confidence_interval(values)
+
+    # ブルー/レッドの撃墜比
+    blue = sum(r['blue_kills'] for r in results)
+    red = sum(r['red_kills'] for r in results)
+    summary['kill_ratio'] = blue / red if red else None
+    return summary
+
+# シードのリストをプロセスプールで並列に実行
+def run_batch(seeds, duration=DEFAULT_DURATION, fighters_per_team=3, processes=None, dt=1 / BASE_FPS,
+              time_skip=True, radar_fov=RADAR_FOV, radar_frequency=RADAR_FREQUENCY, ai_interval=AI_TRANSIT_INTERVAL,
+              missile_model='pixel'):
+    job = partial(run_engagement, duration=duration, fighters_per_team=fighters_per_team, dt=dt,
+                  time_skip=time_skip, radar_fov=radar_fov, radar_frequency=radar_frequency, ai_interval=ai_interval,
+                  missile_model=missile_model)
+    with Pool(processes) as pool:
+        return pool.map(job, seeds, chunksize=max(1, len(seeds) // 64))
+
+def main():
+    parser = argparse.ArgumentParser(description="BLUE vs RED 戦闘のモンテカルロ実行")
+    parser.add_argument('--runs', type=int, default=1000, help="試行回数")
+    parser.add_argument('--seed', type=int, default=0, help="最初のシード（seed, seed+1, ... を使用）")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help="1試行のシミュレーション時間（秒）")
+    parser.add_argument('--fighters', type=int, default=3, help="1チームあたりの戦闘機数")
+    parser.add_argument('--dt', type=float, default=1 / BASE_FPS, help="1ティックの秒数（大きくすると早送り）")
+    parser.add_argument('--no-time-skip', action='store_true', help="巡航区間も1ティックずつ進める")
+    parser.add_argument('--radar-fov', type=float, default=RADAR_FOV, help="レーダーの視野角（度）")
+    parser.add_argument('--radar-frequency', type=float, default=RADAR_FREQUENCY,
+                        help="レーダーの1秒あたりの走査回数（下げると精度と引き換えに速くなる）")
+    parser.add_argument('--ai-interval', type=int, default=AI_TRANSIT_INTERVAL,
+                        help="巡航しているだけの戦闘機が判断するティック間隔（1 なら全機毎ティック）")
+    parser.add_argument('--missile-model', choices=list(MISSILE_MODELS), default='pixel',
+                        help="ミサイルの運動モデル（flight は実単位の飛行モデル）")
+    parser.add_argument('--processes', type=int, default=None, help="ワーカープロセス数（省略時はCPU数）")
+    parser.add_argument('--output', help="試行ごとの結果と集計をJSONで保存するパス")
+    args = parser.parse_args()
+
+    seeds = list(range(args.seed, args.seed + args.runs))
+    results = run_batch(seeds, args.duration, args.fighters, args.processes, args.dt, not args.no_time_skip,
+                        args.radar_fov, args.radar_frequency, args.ai_interval, args.missile_model)
+    summary = aggregate(results)
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'summary': summary, 'results': results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import sys
+
+import numpy as np
+
+import simulation
+from ai_scheduler import SCHEDULE_MIN_FIGHTERS
+from simulation import World
+from snapshot import fork, take_snapshot
+from vec_env import VecEnv
+from world_state import SCALAR_LIMIT
+
+# 高速化のための経路が、同じシードで素直に1ティックずつ進めた結果と一致するかを確かめる
+#   time_skip:   巡航区間の解析的な早送り（World.run の time_skip）と1ティックずつの実行
+#   fork:        途中のスナップショットから fork したワールドと、そのまま続けたワールド
+#   ai_interval: 巡航中の AI を間引く既定の間隔と、全機が毎ティック判断する ai_interval=1
+#   vec_env:     VecEnv に NaN（Fighter.act に任せる）の行動を与えた環境と、素の World
+#   scalar:      数機のワールドで使う1機ずつの計算（SCALAR_LIMIT 以下）と、同じワールドを配列演算だけで進めた結果
+# 早送りは直線運動をまとめて計算し、巡航機の AI を間引くと敵基地への方位を再計算しない（直進中の方位は
+# 理論上変わらないが、位置が進むと atan2 の最下位ビットがずれる）ので、この2つは位置と向きを
+# POSITION_DIGITS 桁で比べる。scalar も math と NumPy の三角関数の最下位ビットが異なることがあるので同じく丸める
+# fork と vec_env は同じ演算を同じ順に行うので、丸めずに完全一致を求める
+
+DEFAULT_SEEDS = 4
+DEFAULT_TICKS = 3000
+POSITION_DIGITS = 6
+FORK_INTERVAL = 250  # fork の比較でスナップショットを取るティック間隔
+AI_INTERVAL_FIGHTERS = -(-SCHEDULE_MIN_FIGHTERS // 2)  # ai_interval の比較に使う1チームの機数（間引きが有効になる最小）
+
+
+# 比較に使うワールドの状態（戦闘機・飛行中のミサイル・撃墜数と発射数）
+def world_state(world, digits=None):
+    def value(v):
+        return v if digits is None else round(v, digits)
+
+    fighters = [(value(f.x), value(f.y), value(f.direction), f.is_alive) for f in world.fighters]
+    missiles = sorted((m.id, value(m.x), value(m.y)) for m in world.missiles)
+    return fighters, missiles, dict(world.kills), world.missiles_fired
+
+
+def check_time_skip(seed, ticks):
+    stepped = World(8, seed=seed)
+    stepped.run(ticks)
+    skipped = World(8, seed=seed)
+    skipped.run(ticks, time_skip=True)
+    return world_state(stepped, POSITION_DIGITS) == world_state(skipped, POSITION_DIGITS)
+
+
+def check_fork(seed, ticks):
+    # 続けて走らせるワールドから一定間隔でスナップショットを取り、fork した側を次の比較点まで進めて比べる
+    world = World(5, seed=seed)
+    forked = None
+    for tick in range(0, ticks, FORK_INTERVAL):
+        world.run(FORK_INTERVAL)
+        if forked is not None:
+            forked.run(FORK_INTERVAL)
+            if world_state(forked) != world_state(world):
+                return False
+        forked = fork(take_snapshot(world))
+    return True
+
+
+def check_ai_interval(seed, ticks):
+    # 間引きは SCHEDULE_MIN_FIGHTERS 機以上のワールドでだけ行われる
+    every_tick = World(AI_INTERVAL_FIGHTERS, seed=seed, ai_interval=1)
+    every_tick.run(ticks)
+    scheduled = World(AI_INTERVAL_FIGHTERS, seed=seed)
+    scheduled.run(ticks)
+    return world_state(every_tick, POSITION_DIGITS) == world_state(scheduled, POSITION_DIGITS)
+
+
+def check_vec_env(seed, ticks):
+    env = VecEnv(1, 3, seed=seed, action_repeat=1, episode_ticks=ticks + 1)
+    env.reset()
+    env.actions[:] = np.nan
+    world = World(3, seed=seed)
+    for _ in range(ticks):
+        env.step()
+        world.step()
+    return world_state(env.worlds[0]) == world_state(world)
+
+
+def check_scalar(seed, ticks):
+    scalar = World(3, seed=seed)
+    scalar.run(ticks)
+    simulation.SCALAR_LIMIT = -1  # 戦闘機やミサイルの数によらず配列演算の経路を通す
+    try:
+        batched = World(3, seed=seed)
+        batched.run(ticks)
+    finally:
+        simulation.SCALAR_LIMIT = SCALAR_LIMIT
+    return world_state(scalar, POSITION_DIGITS) == world_state(batched, POSITION_DIGITS)
+
+
+CHECKS = {
+    'time_skip': check_time_skip,
+    'fork': check_fork,
+    'ai_interval': check_ai_interval,
+    'vec_env': check_vec_env,
+    'scalar': check_scalar,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="高速化した経路と1ティックずつの実行の一致を確かめる")
+    parser.add_argument('--seed', type=int, default=0, help="最初のシード（seed, seed+1, ... を使用）")
+    parser.add_argument('--seeds', type=int, default=DEFAULT_SEEDS, help="確かめるシードの数")
+    parser.add_argument('--ticks', type=int, default=DEFAULT_TICKS, help="1回の比較で進めるティック数")
+    parser.add_argument('--check', choices=list(CHECKS), action='append',
+                        help="確かめる項目（複数指定可、省略時はすべて）")
+    args = parser.parse_args()
+
+    failed = []
+    for name in args.check or CHECKS:
+        for seed in range(args.seed, args.seed + args.seeds):
+            ok = CHECKS[name](seed, args.ticks)
+            print(f"{name:12s} seed {seed}: {'ok' if ok else 'MISMATCH'}")
+            if not ok:
+                failed.append((name, seed))
+
+    if failed:
+        print(f"{len(failed)} 件の不一致: {failed}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import csv
+import json
+import time
+from collections import deque
+
+# メインループのフェーズごとの処理時間と作業量のカウンタ
+# lap(フェーズ名) は直前の lap からの経過時間をそのフェーズに加算する
+# 無効時は NULL_PROFILER（何もしないメソッドだけを持つ）を使うので、計測コストはほぼゼロ
+
+# フェーズ（ループ内の実行順）
+PHASES = (
+    'wait',          # フレームレート調整の待ち時間
+    'events',        # イベント処理
+    'skip',          # 巡航区間の早送り（World.fast_forward）
+    'respawn',       # 爆発とリスポーン
+    'detect',        # 空間インデックス・レーダー探知・セクター包含判定
+    'avoid',         # Fighter.act のうち画面端・ミサイル回避
+    'target',        # Fighter.act のうち攻撃と進路決定
+    'missile_move',  # ミサイルの移動
+    'fighter_move',  # 戦闘機の移動
+    'collision',     # 命中判定
+    'removal',       # ミサイルの削除
+    'sectors',       # 次のティックのセクター計算
+    'record',        # リプレイ記録
+    'draw',          # 描画
+)
+
+# 作業量のカウンタ
+COUNTERS = (
+    'fighters_alive',       # 生存している戦闘機数
+    'missiles_alive',       # 飛翔中のミサイル数
+    'radar_pairs',          # レーダー範囲内の（戦闘機, 敵機・ミサイル）の組
+    'sector_computations',  # 計算したミサイルセクター数
+    'sector_tests',         # 戦闘機 × セクターの包含判定数
+    'collision_pairs',      # 命中判定の候補の組
+    'ai_decisions',         # Fighter.act を実行した戦闘機数
+)
+
+OVERLAY_WINDOW = 60  # 画面表示の移動平均に使うティック数
+
+
+class NullProfiler:
+    enabled = False
+
+    def lap(self, phase):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def end_tick(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, csv_path=None, window=OVERLAY_WINDOW):
+        self.last = time.perf_counter()
+        self.phases = dict.fromkeys(PHASES, 0.0)  # このティックのフェーズごとの秒数
+        self.counters = dict.fromkeys(COUNTERS, 0)  # このティックのカウンタ
+        self.recent = deque(maxlen=window)  # 直近のティックの (phases, counters)
+        self.ticks = 0
+        self.phase_total = dict.fromkeys(PHASES, 0.0)
+        self.phase_max = dict.fromkeys(PHASES, 0.0)
+        self.counter_total = dict.fromkeys(COUNTERS, 0)
+        self.counter_max = dict.fromkeys(COUNTERS, 0)
+        self.csv_file = None
+        if csv_path:
+            # ティックごとの行を逐次書き出す（長時間でもメモリを使わない）
+            self.csv_file = open(csv_path, 'w', newline='')
+            self.csv = csv.writer(self.csv_file)
+            self.csv.writerow(('tick',) + tuple(f"{phase}_ms" for phase in PHASES) + COUNTERS)
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] += now - self.last
+        self.last = now
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def end_tick(self):
+        # このティックの値を集計して次のティックへ
+        phases, counters = self.phases, self.counters
+        for phase, seconds in phases.items():
+            self.phase_total[phase] += seconds
+            if seconds > self.phase_max[phase]:
+                self.phase_max[phase] = seconds
+        for name, n in counters.items():
+            self.counter_total[name] += n
+            if n > self.counter_max[name]:
+                self.counter_max[name] = n
+        if self.csv_file:
+            self.csv.writerow((self.ticks,) + tuple(round(phases[p] * 1000, 4) for p in PHASES)
+                              + tuple(counters[c] for c in COUNTERS))
+        self.recent.append((phases, counters))
+        self.ticks += 1
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def overlay_lines(self):
+        # 直近 window ティックの平均（画面表示用の文字列）
+        n = max(len(self.recent), 1)
+        lines = []
+        total = 0.0
+        for phase in PHASES:
+            ms = sum(phases[phase] for phases, _ in self.recent) / n * 1000
+            total += ms
+            lines.append(f"{phase:<13}{ms:7.3f} ms")
+        lines.append(f"{'total':<13}{total:7.3f} ms")
+        for name in COUNTERS:
+            lines.append(f"{name:<20}{sum(counters[name] for _, counters in self.recent) / n:8.1f}")
+        return lines
+
+    def summary(self):
+        ticks = max(self.ticks, 1)
+        total = sum(self.phase_total.values())
+        return {
+            'ticks': self.ticks,
+            'phases': {phase: {
+                'mean_ms': self.phase_total[phase] / ticks * 1000,
+                'max_ms': self.phase_max[phase] * 1000,
+                'total_s': self.phase_total[phase],
+                'share': self.phase_total[phase] / total if total else 0.0,
+            } for phase in PHASES},
+            'counters': {name: {
+                'mean': self.counter_total[name] / ticks,
+                'max': self.counter_max[name],
+            } for name in COUNTERS},
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def close(self):
+        if self.csv_file:
+            self.csv_file.close()
+            self.csv_file = None
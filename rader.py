@@ -1,11 +1,41 @@
+import math
+
+# 戦闘機に搭載するレーダー（探知距離・視野角・走査周波数）
+# 走査周波数で決まる走査ティックにだけ探知を更新し、走査の間は前回の探知を保持する
+# 走査そのもの（敵機の空間インデックスへの問い合わせ）は飛行隊のデータリンク（aircraft.Squadron）がまとめて行う
+
+SCAN_EPSILON = 1e-9  # 走査時刻の比較で許容する丸め誤差（秒）
+
+
 class Radar:
     def __init__(self, range, fov, frequency):
-        self.range = range
-        self.fov = fov
-        self.frequency = frequency
-
-    def detect(self, aircraft):
-        # 簡単な検出ロジック
-        if abs(self.x - aircraft.x) < self.range:
-            return True
-        return False
+        self.range = range  # 探知距離（ピクセル）
+        self.fov = fov  # 視野角（度、360 以上なら全周）
+        self.frequency = frequency  # 1秒あたりの走査回数
+        self.next_scan = 0.0  # 次に走査するシミュレーション時刻（秒）
+
+    @property
+    def interval(self):
+        # 走査の間隔（秒）
+        return 1 / self.frequency
+
+    def stagger(self, fraction):
+        # 走査の位相を間隔の fraction 倍だけずらす（同じ周波数の機体の走査が同じティックに集中しないように）
+        self.next_scan = fraction * self.interval
+
+    def scan_due(self, time):
+        # 時刻 time のティックで走査するか（走査する場合は次の走査時刻へ進める）
+        if time < self.next_scan - SCAN_EPSILON:
+            return False
+        self.next_scan += self.interval
+        if self.next_scan <= time + SCAN_EPSILON:
+            # ティックが走査間隔より長い場合は、毎ティック走査する
+            self.next_scan = time + self.interval
+        return True
+
+    def catch_up(self, time):
+        # 時刻 time のティックまで毎ティック走査したものとして、次の走査時刻を進める
+        # （探知が起きない区間を早送りで飛ばしたときに、走査の位相を毎ティック進めた場合と揃える）
+        if self.next_scan <= time + SCAN_EPSILON:
+            missed = math.floor((time + SCAN_EPSILON - self.next_scan) / self.interval) + 1
+            self.next_scan += missed * self.interval
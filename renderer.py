@@ -0,0 +1,245 @@
+import math
+
+import numpy as np
+import pygame
+
+from camera import Camera
+from simulation import FIGHTER_SIZE, MISSILE_FLYOUT, MISSILE_SIZE, RADAR_RANGE
+
+# ダーティ矩形方式の描画
+# 変化しない背景はサーフェス（レイヤー）にキャッシュしておき、毎フレームは前フレームに
+# 動的な物を描いたタイルだけをレイヤーから復元して描き直す
+# 画面を TILE 四方のタイルに分け、描いた輪郭が通るタイルだけを記録して、
+# 横に連続するタイルをまとめた矩形を pygame.display.update に渡す
+# レーダー円とセクターの輪郭（頂点と、タイル判定用の輪郭上の点）は入力ごとにキャッシュする
+#
+# 位置はカメラ（camera.Camera）でワールド座標から画面座標に変換して描く
+# 描画の前に全ての物の位置を配列でまとめて判定し、画面の外にある物（レーダー円やセクターが画面にかからない物）は描かない
+# 縮小して DETAIL_ZOOM 未満になったら、レーダー円とセクターは描かず、機首方向・進行方向の短い線に置き換える
+
+# 色の定義
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)         # ミサイルの色をBLACKに設定
+GREEN = (0, 255, 0)
+YELLOW = (255, 255, 0)
+ORANGE = (255, 165, 0)
+CYAN = (0, 255, 255)    # 回避用の色
+MAGENTA = (255, 0, 255) # 攻撃用の色
+GRAY = (200, 200, 200)  # コーンの色
+
+TILE = 64  # ダーティ判定のタイルの大きさ（ピクセル）
+OUTLINE_STEP = 32  # タイル判定用に輪郭上へ置く点の間隔（ピクセル）
+OUTLINE_MARGIN = OUTLINE_STEP // 2 + 2  # 点の間の線と、線の太さ・丸めの分だけ点の周囲も含める（TILE / 2 未満）
+SECTOR_ARC_STEP = 10  # セクターの円弧を折れ線にする角度の刻み（度）
+SECTOR_CACHE_SIZE = 4096  # キャッシュするセクター形状の数
+FULL_UPDATE_RATIO = 0.5  # 更新するタイルが画面のこの割合を超えたら全体を1回で更新する
+DETAIL_ZOOM = 0.5  # これ以上の拡大率ならレーダー円とセクターを描く
+LEADER_LENGTH = 8  # 簡略表示で機首方向・進行方向に引く線の長さ（ピクセル）
+AVOID_LINE_LENGTH = 50  # 回避方向の線の長さ（ワールド座標）
+EXPLOSION_MARGIN = 24  # 爆発の円の最大半径（ピクセル）
+MAX_SECTOR_RADIUS = float(MISSILE_FLYOUT.reach.max())  # セクターの半径の上限（ワールド座標）
+
+
+# 線分 start[i] → end[i] の上に、OUTLINE_STEP 間隔で点を並べる（両端を含む）
+def _segment_samples(start, end):
+    delta = end - start
+    steps = np.maximum(np.ceil(np.hypot(delta[:, 0], delta[:, 1]) / OUTLINE_STEP), 1).astype(np.intp)
+    counts = steps + 1
+    segment = np.repeat(np.arange(len(delta)), counts)
+    t = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)) / steps[segment]
+    return start[segment] + delta[segment] * t[:, None]
+
+
+class Renderer:
+    def __init__(self, screen):
+        self.screen = screen
+        self.screen_rect = screen.get_rect()
+        self.layer = pygame.Surface(screen.get_size())  # 変化しない背景
+        self.layer.fill(WHITE)
+        rows = math.ceil(self.screen_rect.height / TILE)
+        cols = math.ceil(self.screen_rect.width / TILE)
+        self.previous = np.ones((rows, cols), dtype=bool)  # 前フレームに描いたタイル（最初は全体を描き直す）
+        self.rings = {}  # 半径ごとのレーダー円の輪郭上の点（中心からの相対位置）
+        self.sector_shapes = {}  # (半径, 向き, 角度幅) ごとのセクターの頂点と輪郭上の点（ミサイルからの相対位置）
+        self.camera = Camera(screen.get_size(), screen.get_size())  # カメラを渡されなかったときの等倍の変換
+        self.view = None  # 前フレームにカメラが映していた範囲
+
+    def _ring(self, radius):
+        samples = self.rings.get(radius)
+        if samples is None:
+            angles = np.linspace(0, 2 * math.pi, max(math.ceil(2 * math.pi * radius / OUTLINE_STEP), 8))
+            samples = np.column_stack((radius * np.cos(angles), radius * np.sin(angles)))
+            self.rings[radius] = samples
+        return samples
+
+    def _sector_shape(self, radius, direction, angle_width):
+        # セクターの輪郭（ミサイル → 左端 → 円弧 → 右端 → ミサイル）を整数に丸めた入力ごとにキャッシュ
+        # radius は画面上の半径（ピクセル）
+        key = (round(radius), round(direction) % 360, round(angle_width))
+        shape = self.sector_shapes.get(key)
+        if shape is None:
+            radius, direction, angle_width = key
+            if len(self.sector_shapes) >= SECTOR_CACHE_SIZE:
+                self.sector_shapes.clear()
+            steps = max(math.ceil(angle_width / SECTOR_ARC_STEP), 1)
+            angles = np.radians(np.linspace(direction - angle_width / 2, direction + angle_width / 2, steps + 1))
+            arc = np.column_stack((radius * np.cos(angles), radius * np.sin(angles)))
+            points = np.concatenate(([(0.0, 0.0)], arc))
+            shape = (points, _segment_samples(points, np.roll(points, -1, axis=0)))
+            self.sector_shapes[key] = shape
+        return shape
+
+    def _mark_points(self, tiles, points):
+        # 点の周囲 OUTLINE_MARGIN 四方が入るタイルを記録（画面外は周囲1タイル分の余白に集める）
+        rows, cols = tiles.shape
+        padded = np.zeros((rows + 2, cols + 2), dtype=bool)
+        # 「タイル番号 + 1」は -TILE 以上の座標なら切り捨てで求まり、それより左上は 0 にまとめられる
+        x, y = points[:, 0] / TILE + 1, points[:, 1] / TILE + 1
+        margin = OUTLINE_MARGIN / TILE
+        tx = [np.clip(x + dx, 0, cols + 1).astype(np.intp) for dx in (-margin, margin)]
+        ty = [np.clip(y + dy, 0, rows + 1).astype(np.intp) for dy in (-margin, margin)]
+        for ix in tx:
+            for iy in ty:
+                padded[iy, ix] = True
+        tiles |= padded[1:-1, 1:-1]
+
+    def _mark_rect(self, tiles, rect):
+        # 矩形が重なるタイルを記録
+        if rect.width and rect.height:
+            left, top = max(rect.left // TILE, 0), max(rect.top // TILE, 0)
+            tiles[top:(rect.bottom - 1) // TILE + 1, left:(rect.right - 1) // TILE + 1] = True
+
+    def _tile_rects(self, tiles):
+        # 横に連続するタイルを1つの矩形にまとめる
+        rows, cols = tiles.shape
+        padded = np.zeros((rows, cols + 1), dtype=np.int8)
+        padded[:, :cols] = tiles
+        edges = np.diff(padded.ravel(), prepend=0)
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        return [pygame.Rect(start % (cols + 1) * TILE, start // (cols + 1) * TILE, (end - start) * TILE, TILE)
+                for start, end in zip(starts.tolist(), ends.tolist())]
+
+    def _leader(self, color, x, y, direction, lines):
+        # 簡略表示: 向いている方向へ LEADER_LENGTH の線を引く
+        radians = math.radians(direction)
+        end = (int(x + LEADER_LENGTH * math.cos(radians)), int(y + LEADER_LENGTH * math.sin(radians)))
+        pygame.draw.line(self.screen, color, (x, y), end, 1)
+        lines.append((x, y) + end)
+
+    def _draw_missile(self, missile, sx, sy, sector, zoom, outlines, lines, rects):
+        screen = self.screen
+        x, y = int(sx), int(sy)
+        rects.append(pygame.draw.circle(screen, BLACK, (x, y), MISSILE_SIZE))
+        if sector is None:
+            self._leader(GRAY, x, y, missile.direction, lines)
+        # セクターの角度幅が360度以上の場合、全円を描画
+        elif sector['angle_width'] >= 360:
+            radius = int(sector['radius'] * zoom)
+            pygame.draw.circle(screen, GRAY, (x, y), radius, 1)
+            outlines.append((self._ring(radius), x, y))
+        else:
+            points, samples = self._sector_shape(sector['radius'] * zoom, sector['direction'], sector['angle_width'])
+            pygame.draw.lines(screen, GRAY, True, (points + (sx, sy)).tolist(), 1)
+            outlines.append((samples, sx, sy))
+
+    def _draw_fighter(self, fighter, sx, sy, camera, detail, outlines, lines, rects):
+        screen = self.screen
+        zoom = camera.zoom
+        x, y = int(sx), int(sy)
+        # 戦闘機が生きている場合のみ描画
+        if fighter.is_alive:
+            rects.append(pygame.draw.circle(screen, fighter.team_color, (x, y), FIGHTER_SIZE))
+            if detail:
+                # レーダーの範囲を円で表示
+                radius = int(fighter.radar_range * zoom)
+                pygame.draw.circle(screen, GREEN, (x, y), radius, 1)
+                outlines.append((self._ring(radius), x, y))
+            else:
+                self._leader(fighter.team_color, x, y, fighter.direction, lines)
+
+        # 回避中のミサイルと戦闘機をシアンの線で結ぶ
+        if fighter.avoiding_missile:
+            end = (int(sx + fighter.avoid_direction[0] * AVOID_LINE_LENGTH * zoom),
+                   int(sy + fighter.avoid_direction[1] * AVOID_LINE_LENGTH * zoom))
+            pygame.draw.line(screen, CYAN, (x, y), end, 1)
+            lines.append((x, y) + end)
+
+        # 攻撃中の敵と戦闘機をマゼンタの線で結ぶ
+        if fighter.attacking_enemy:
+            ex, ey = camera.to_screen(fighter.attacking_enemy.x, fighter.attacking_enemy.y)
+            end = (int(ex), int(ey))
+            pygame.draw.line(screen, MAGENTA, (x, y), end, 1)
+            lines.append((x, y) + end)
+
+    def _draw_explosion(self, explosion, sx, sy, rects):
+        if explosion.frame < explosion.max_frames:
+            rects.append(pygame.draw.circle(self.screen, ORANGE, (int(sx), int(sy)),
+                                            int(10 + explosion.frame * 2), 1))
+
+    def _cull(self, objects, camera, margin):
+        # 画面の外側 margin ピクセルまでに映る物だけを、画面座標と一緒に返す（位置を配列にまとめて一度に判定する）
+        n = len(objects)
+        if n == 0:
+            return []
+        x = np.fromiter((o.x for o in objects), dtype=np.float64, count=n)
+        y = np.fromiter((o.y for o in objects), dtype=np.float64, count=n)
+        keep = np.flatnonzero(camera.visible(x, y, margin))
+        sx, sy = camera.to_screen(x[keep], y[keep])
+        return [(objects[i], px, py) for i, px, py in zip(keep.tolist(), sx.tolist(), sy.tolist())]
+
+    def draw(self, fighters, missiles, sector_of, explosions, overlay=None, camera=None):
+        # 1フレームを描画して画面へ反映する
+        # sector_of(missile) はミサイルの到達可能セクター、overlay(screen) は追加で描いた矩形のリストを返す
+        # camera を省略するとワールド座標をそのまま画面座標として描く
+        screen = self.screen
+        camera = camera or self.camera
+        zoom = camera.zoom
+        detail = zoom >= DETAIL_ZOOM
+        if camera.state() != self.view:
+            # カメラが動いたら画面全体が変わる
+            self.view = camera.state()
+            self.previous[:] = True
+        previous = self.previous
+        full_tiles = FULL_UPDATE_RATIO * previous.size
+
+        # 前フレームに描いたタイルを、レイヤーから復元して消す
+        # （タイルが多い場合は画面全体を1回で復元する）
+        restore_all = previous.sum() > full_tiles
+        if restore_all:
+            screen.blit(self.layer, (0, 0))
+        else:
+            screen.blits([(self.layer, rect, rect) for rect in self._tile_rects(previous)], False)
+
+        outlines = []  # 描いた輪郭上の点（相対位置, x, y）
+        lines = []  # 描いた線分 (x0, y0, x1, y1)
+        rects = []  # 描いた小さな図形の矩形
+        # 画面にかかる物だけを描く（セクターもここで残った物の分だけ求める）
+        margin = MAX_SECTOR_RADIUS * zoom if detail else LEADER_LENGTH
+        for missile, sx, sy in self._cull(missiles, camera, margin):
+            self._draw_missile(missile, sx, sy, sector_of(missile) if detail else None, zoom, outlines, lines, rects)
+        for explosion, sx, sy in self._cull(explosions, camera, EXPLOSION_MARGIN):
+            self._draw_explosion(explosion, sx, sy, rects)
+        margin = max(RADAR_RANGE if detail else 0, AVOID_LINE_LENGTH) * zoom + max(FIGHTER_SIZE, LEADER_LENGTH)
+        for fighter, sx, sy in self._cull(fighters, camera, margin):
+            self._draw_fighter(fighter, sx, sy, camera, detail, outlines, lines, rects)
+        if overlay:
+            rects.extend(overlay(screen))
+
+        drawn = np.zeros_like(previous)
+        points = [relative + (x, y) for relative, x, y in outlines]
+        if lines:
+            lines = np.array(lines, dtype=float)
+            points.append(_segment_samples(lines[:, :2], lines[:, 2:]))
+        if points:
+            self._mark_points(drawn, np.concatenate(points))
+        for rect in rects:
+            self._mark_rect(drawn, rect)
+
+        # 変化したタイルだけを更新（広すぎる場合は全体を1回で更新した方が速い）
+        changed = previous | drawn
+        if restore_all or changed.sum() > full_tiles:
+            pygame.display.update()
+        else:
+            pygame.display.update(self._tile_rects(changed))
+        self.previous = drawn
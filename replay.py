@@ -0,0 +1,359 @@
+import argparse
+import struct
+from types import SimpleNamespace
+
+import numpy as np
+
+from simulation import BASE_FPS, BLUE, HEIGHT, RED, RADAR_RANGE, WIDTH, World, calculate_missile_sector
+
+# 戦闘の記録（固定長レコードのバイナリファイル）と、その再生
+# 再生時はファイルをメモリマップするので、長時間の記録でもメモリ使用量は一定
+#
+# ファイル構成
+#   ヘッダー: HEADER
+#   ティックごとのブロック: TICK_DTYPE 1件 + FIGHTER_DTYPE × 戦闘機数 + MISSILE_DTYPE × ミサイル数
+#                           + EXPLOSION_DTYPE × 爆発数
+#   キーフレーム索引: INDEX_DTYPE × 件数（KEYFRAME_INTERVAL ブロックごとの tick とファイル位置）
+#   トレーラー: TRAILER（索引の位置と件数）
+# 各ブロックは完全な状態を持つので、キーフレームから最大 KEYFRAME_INTERVAL - 1 ブロック辿れば任意のティックに届く
+
+MAGIC = b'ATSREPL2'
+INDEX_MAGIC = b'ATSRINDX'
+HEADER = struct.Struct('<8sdiidd')  # マジック, dt, 戦闘機数, キーフレーム間隔, ワールドの幅, 高さ
+TRAILER = struct.Struct('<8sqq')  # マジック, 索引の位置, 索引の件数
+KEYFRAME_INTERVAL = 60  # キーフレームを置くブロック間隔
+
+TICK_DTYPE = np.dtype([
+    ('tick', '<i8'),
+    ('n_missiles', '<i4'),
+    ('n_explosions', '<i4'),
+    ('blue_kills', '<i4'),
+    ('red_kills', '<i4'),
+])
+FIGHTER_DTYPE = np.dtype([
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('direction', '<f4'),
+    ('speed', '<f4'),
+    ('avoid_dx', '<f4'),  # 回避方向（回避中のみ）
+    ('avoid_dy', '<f4'),
+    ('attacking', '<i2'),  # 攻撃対象の戦闘機番号（なければ -1）
+    ('team', 'i1'),
+    ('flags', 'u1'),  # FLAG_ALIVE | FLAG_AVOIDING
+])
+MISSILE_DTYPE = np.dtype([
+    ('id', '<i4'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('direction', '<f4'),
+    ('speed', '<f4'),
+    ('age', '<f4'),
+    ('owner', '<i2'),  # 発射した戦闘機番号
+    ('target', '<i2'),  # 目標の戦闘機番号
+    ('expired', 'u1'),
+])
+EXPLOSION_DTYPE = np.dtype([
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('frame', '<f4'),
+])
+INDEX_DTYPE = np.dtype([('tick', '<i8'), ('offset', '<i8')])
+
+FLAG_ALIVE = 1
+FLAG_AVOIDING = 2
+
+# チームID と色の対応
+TEAM_COLORS = {0: BLUE, 1: RED}
+
+
+# ワールドの状態をレコード配列へ書き込む（ミサイル・爆発は配列の長さの分だけ先頭から書き、ヘッダーの件数もそれに合わせる）
+# 配列は新しく確保したものでも、共有メモリ上のビュー（live.FrameRing）でもよい
+def fill_records(world, header, fighters, missiles, explosions):
+    header[0] = (world.tick, len(missiles), len(explosions), world.kills[BLUE], world.kills[RED])
+
+    team = world.fighter_state.team
+    for i, fighter in enumerate(world.fighters):
+        avoid = fighter.avoid_direction if fighter.avoiding_missile else (0, 0)
+        attacking = fighter.attacking_enemy.slot if fighter.attacking_enemy else -1
+        flags = (FLAG_ALIVE if fighter.is_alive else 0) | (FLAG_AVOIDING if fighter.avoiding_missile else 0)
+        fighters[i] = (fighter.x, fighter.y, fighter.direction, fighter.speed, avoid[0], avoid[1], attacking,
+                       team[fighter.slot], flags)
+
+    for i, missile in zip(range(len(missiles)), world.missile_state.objects):
+        missiles[i] = (missile.id, missile.x, missile.y, missile.direction, missile.speed, missile.age,
+                       missile.owner.slot, missile.target.slot, missile.expired)
+
+    for i, explosion in zip(range(len(explosions)), world.explosions):
+        explosions[i] = (explosion.x, explosion.y, explosion.frame)
+
+
+class ReplayWriter:
+    def __init__(self, path, world):
+        self.world = world
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, world.clock.dt, len(world.fighters), KEYFRAME_INTERVAL, world.width,
+                                    world.height))
+        self.blocks = 0  # 書き込んだブロック数
+        self.keyframes = []  # (tick, ファイル位置)
+
+    def record(self, world=None):
+        # 現在のティックの状態を1ブロックとして追記する
+        world = world or self.world
+        if self.blocks % KEYFRAME_INTERVAL == 0:
+            self.keyframes.append((world.tick, self.file.tell()))
+        self.blocks += 1
+
+        header = np.zeros(1, dtype=TICK_DTYPE)
+        f = np.zeros(len(world.fighters), dtype=FIGHTER_DTYPE)
+        m = np.zeros(world.missile_state.count, dtype=MISSILE_DTYPE)
+        e = np.zeros(len(world.explosions), dtype=EXPLOSION_DTYPE)
+        fill_records(world, header, f, m, e)
+        for records in (header, f, m, e):
+            self.file.write(records.tobytes())
+
+    def close(self):
+        # キーフレーム索引とトレーラーを書いて閉じる
+        index_offset = self.file.tell()
+        self.file.write(np.array(self.keyframes, dtype=INDEX_DTYPE).tobytes())
+        self.file.write(TRAILER.pack(INDEX_MAGIC, index_offset, len(self.keyframes)))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayReader:
+    def __init__(self, path):
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        if len(self.data) < HEADER.size or self.data[:len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError(f"{path} はリプレイファイルではありません")
+        _, self.dt, self.n_fighters, self.keyframe_interval, self.width, self.height = HEADER.unpack_from(self.data)
+        self.fighter_bytes = self.n_fighters * FIGHTER_DTYPE.itemsize
+
+        # トレーラーから索引を読む（記録が途中で終わったファイルは先頭から辿って作り直す）
+        magic, index_offset, count = TRAILER.unpack_from(self.data, len(self.data) - TRAILER.size)
+        if magic == INDEX_MAGIC:
+            self.end = index_offset  # ブロック領域の終わり
+            index = self.data[index_offset:index_offset + count * INDEX_DTYPE.itemsize].view(INDEX_DTYPE)
+        else:
+            self.end, index = self._scan()
+        self.key_ticks = np.array(index['tick'])
+        self.key_offsets = np.array(index['offset'])
+        self.first_tick = int(self.key_ticks[0]) if len(self.key_ticks) else 0
+        self.last_tick = self.first_tick
+        if len(self.key_offsets):
+            # 最後のキーフレームから末尾まで辿って最後のティックを求める
+            offset = int(self.key_offsets[-1])
+            while offset < self.end:
+                self.last_tick = self._tick_at(offset)
+                offset = self._next(offset)
+
+    def _header(self, offset):
+        return self.data[offset:offset + TICK_DTYPE.itemsize].view(TICK_DTYPE)[0]
+
+    def _tick_at(self, offset):
+        return int(self._header(offset)['tick'])
+
+    def _next(self, offset):
+        # 次のブロックのファイル位置
+        header = self._header(offset)
+        return (offset + TICK_DTYPE.itemsize + self.fighter_bytes
+                + int(header['n_missiles']) * MISSILE_DTYPE.itemsize
+                + int(header['n_explosions']) * EXPLOSION_DTYPE.itemsize)
+
+    def _scan(self):
+        # ブロックのヘッダーだけを辿って索引を作る
+        offset = HEADER.size
+        index = []
+        blocks = 0
+        while offset + TICK_DTYPE.itemsize <= len(self.data):
+            following = self._next(offset)
+            if following > len(self.data):
+                break  # 書きかけのブロック
+            if blocks % self.keyframe_interval == 0:
+                index.append((self._tick_at(offset), offset))
+            blocks += 1
+            offset = following
+        return offset, np.array(index, dtype=INDEX_DTYPE)
+
+    def seek(self, tick):
+        # tick 以前で最後に記録されたブロックのファイル位置（ブロックが1つも無い記録なら None）
+        if not len(self.key_offsets):
+            return None
+        k = max(int(np.searchsorted(self.key_ticks, tick, 'right')) - 1, 0)
+        offset = int(self.key_offsets[k])
+        while True:
+            following = self._next(offset)
+            if following >= self.end or self._tick_at(following) > tick:
+                return offset
+            offset = following
+
+    def next_offset(self, offset):
+        # 順再生用：次のブロックの位置（末尾なら None）
+        following = self._next(offset)
+        return following if following < self.end else None
+
+    def frame(self, offset):
+        # ブロックの内容をメモリマップ上のビューとして返す
+        header = self._header(offset)
+        start = offset + TICK_DTYPE.itemsize
+        fighters = self.data[start:start + self.fighter_bytes].view(FIGHTER_DTYPE)
+        start += self.fighter_bytes
+        n = int(header['n_missiles']) * MISSILE_DTYPE.itemsize
+        missiles = self.data[start:start + n].view(MISSILE_DTYPE)
+        start += n
+        n = int(header['n_explosions']) * EXPLOSION_DTYPE.itemsize
+        explosions = self.data[start:start + n].view(EXPLOSION_DTYPE)
+        return header, fighters, missiles, explosions
+
+
+# ヘッドレスで1戦闘を実行して記録する
+def record_engagement(path, seed=None, duration=300, fighters_per_team=3, world_scale=1):
+    world = World(fighters_per_team, seed=seed, width=WIDTH * world_scale, height=HEIGHT * world_scale)
+    with ReplayWriter(path, world) as writer:
+        writer.record()
+        for _ in range(round(duration / world.clock.dt)):
+            world.step()
+            writer.record()
+    return world
+
+
+# 記録を描画関数（main.py）が読める形に変換する
+def fighter_views(fighters):
+    views = [SimpleNamespace(x=float(f['x']), y=float(f['y']), direction=float(f['direction']),
+                             team_color=TEAM_COLORS[int(f['team'])],
+                             radar_range=RADAR_RANGE, is_alive=bool(f['flags'] & FLAG_ALIVE),
+                             avoiding_missile=bool(f['flags'] & FLAG_AVOIDING),
+                             avoid_direction=(float(f['avoid_dx']), float(f['avoid_dy'])),
+                             attacking_enemy=None)
+             for f in fighters]
+    for view, attacking in zip(views, fighters['attacking'].tolist()):
+        if attacking >= 0:
+            view.attacking_enemy = views[attacking]
+    return views
+
+
+def missile_views(missiles):
+    return [SimpleNamespace(x=float(m['x']), y=float(m['y']), direction=float(m['direction']),
+                            speed=float(m['speed']), age=float(m['age']))
+            for m in missiles]
+
+
+def explosion_views(explosions):
+    return [SimpleNamespace(x=float(e['x']), y=float(e['y']), frame=float(e['frame']), max_frames=6)
+            for e in explosions]
+
+
+# リプレイプレイヤー
+# Space: 一時停止 / ←→: 5秒戻る・進む / ↑↓: 再生速度 / Home・End: 先頭・末尾 / 下端のバーをクリック: シーク
+# カメラの操作は camera.py（ホイール: 拡大・縮小 / 右ドラッグ・W・A・S・D: パン / F: 全体）
+def play(path):
+    import pygame
+    from camera import Camera
+    from renderer import BLACK, GRAY, Renderer
+
+    reader = ReplayReader(path)
+    if reader.seek(reader.first_tick) is None:
+        print(f"{path} には再生するティックがありません")
+        return
+    ticks_per_second = round(1 / reader.dt)
+    bar_height = 8
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption(f"リプレイ: {path}")
+    font = pygame.font.Font(None, 24)
+    clock = pygame.time.Clock()
+    renderer = Renderer(screen)
+    camera = Camera((WIDTH, HEIGHT), (reader.width, reader.height))
+
+    tick = reader.first_tick  # 再生位置
+    offset = reader.seek(tick)
+    paused = False
+    speed = 1  # 1描画フレームで進めるティック数
+    run = True
+
+    while run:
+        clock.tick(BASE_FPS)
+        target = tick
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                run = False
+            elif camera.handle_event(event):
+                pass
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_RIGHT:
+                    target = tick + 5 * ticks_per_second
+                elif event.key == pygame.K_LEFT:
+                    target = tick - 5 * ticks_per_second
+                elif event.key == pygame.K_UP:
+                    speed = min(speed * 2, 64)
+                elif event.key == pygame.K_DOWN:
+                    speed = max(speed // 2, 1)
+                elif event.key == pygame.K_HOME:
+                    target = reader.first_tick
+                elif event.key == pygame.K_END:
+                    target = reader.last_tick
+            elif (event.type == pygame.MOUSEBUTTONDOWN and event.button == 1
+                  and event.pos[1] >= HEIGHT - bar_height * 2):
+                span = max(reader.last_tick - reader.first_tick, 1)
+                target = reader.first_tick + round(event.pos[0] / WIDTH * span)
+        if not paused and target == tick:
+            target = tick + speed
+        target = min(max(target, reader.first_tick), reader.last_tick)
+
+        if target != tick:
+            if target > tick and target - tick <= reader.keyframe_interval:
+                # 近くへの前進はブロックを順に辿る
+                following = reader.next_offset(offset)
+                while following is not None and reader._tick_at(following) <= target:
+                    offset = following
+                    following = reader.next_offset(offset)
+            else:
+                offset = reader.seek(target)
+            tick = target
+
+        header, fighters, missiles, explosions = reader.frame(offset)
+
+        # 再生位置のバーと情報
+        def overlay(screen):
+            span = max(reader.last_tick - reader.first_tick, 1)
+            text = (f"{tick * reader.dt:7.1f}s / {reader.last_tick * reader.dt:.1f}s  x{speed}"
+                    f"  BLUE {int(header['blue_kills'])} - RED {int(header['red_kills'])}"
+                    + ("  (一時停止)" if paused else ""))
+            return [pygame.draw.rect(screen, GRAY, (0, HEIGHT - bar_height, WIDTH, bar_height)),
+                    pygame.draw.rect(screen, BLACK, (0, HEIGHT - bar_height,
+                                                     WIDTH * (tick - reader.first_tick) // span, bar_height)),
+                    screen.blit(font.render(text, True, BLACK), (10, 10))]
+
+        renderer.draw(fighter_views(fighters), missile_views(missiles), calculate_missile_sector,
+                      explosion_views(explosions), overlay, camera)
+
+    pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="戦闘の記録と再生")
+    sub = parser.add_subparsers(dest='command', required=True)
+    record = sub.add_parser('record', help="ヘッドレスで戦闘を実行して記録する")
+    record.add_argument('path')
+    record.add_argument('--seed', type=int, default=None, help="乱数シード")
+    record.add_argument('--duration', type=float, default=300, help="シミュレーション時間（秒）")
+    record.add_argument('--fighters', type=int, default=3, help="1チームあたりの戦闘機数")
+    record.add_argument('--world-scale', type=float, default=1, help="ワールドの大きさ（画面 1280x720 の何倍か）")
+    player = sub.add_parser('play', help="記録を再生する")
+    player.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record_engagement(args.path, args.seed, args.duration, args.fighters, args.world_scale)
+    else:
+        play(args.path)
+
+if __name__ == "__main__":
+    main()
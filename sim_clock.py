@@ -0,0 +1,23 @@
+# 固定タイムステップのシミュレーション時計
+# 壁時計（pygame.time.get_ticks など）には依存せず、ティック数と dt だけで時刻が決まる
+# クールダウン・ミサイルの経過時間・リスポーン・爆発などは全てこの時計を参照する
+
+class SimClock:
+    def __init__(self, dt, frame_rate):
+        self.dt = dt  # 1ティックあたりの秒数
+        self.frame_rate = frame_rate  # 「フレーム」単位の基準（1秒あたりのフレーム数）
+        self.frames_per_tick = dt * frame_rate  # 1ティックで進むフレーム数
+        self.tick = 0  # 経過ティック数
+
+    def advance(self, ticks=1):
+        self.tick += ticks
+
+    @property
+    def time(self):
+        # 経過時間（秒）。加算の誤差が溜まらないようにティック数から計算する
+        return self.tick * self.dt
+
+    @property
+    def frames(self):
+        # 経過時間（フレーム単位）。FIRE_COOLDOWN などフレーム数で決めた定数と比較する
+        return self.tick * self.frames_per_tick
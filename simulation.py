@@ -0,0 +1,1257 @@
+import math
+import random
+from functools import cache
+from types import SimpleNamespace
+
+import numpy as np
+
+from ai_scheduler import AIScheduler
+from aircraft import ROE_WEAPONS_FREE, Squadron
+from flight_model import FIGHTER_PARAMS, MissileFlight, lead_heading
+from flight_model import launch_envelope as flight_launch_envelope
+from flyout import FlyoutTable
+from launch_envelope import LaunchEnvelope, aspect_angle
+from profiler import NULL_PROFILER
+from rader import Radar
+from sim_clock import SimClock
+from spatial_index import UniformGrid, split_by_query
+from ut_commad_map import SCHEDULE_EPSILON, CommandMap
+from world_state import (FIGHTER_FIELDS, MISSILE_FIELDS, SCALAR_LIMIT, TEAM_BLUE, TEAM_RED, EntityArrays,
+                         array_field)
+
+# 描画に依存しないシミュレーション本体（pygame不要）
+# ビューアは main.py が担当する
+
+# ワールドの既定の大きさ（画面サイズと同じ1280x720）
+# World(width=, height=) で広い戦域にもできる（表示はビューアのカメラで拡大・縮小する）
+WIDTH, HEIGHT = 1280, 720
+
+# チームの色（チームの識別にも使用）
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+
+# FPS設定
+BASE_FPS = 60  # 基本のFPS（「フレーム」= 1/BASE_FPS 秒。標準の1ティックは1フレーム）
+
+# 戦闘機とミサイルの設定
+FIGHTER_SIZE = 3  # 戦闘機の描画半径
+MISSILE_SIZE = 2  # ミサイルの描画半径
+FIGHTER_SPEED = 0.2  # 戦闘機の速度
+MISSILE_MAX_SPEED = 0.6  # ミサイルの最大速度
+MISSILE_INITIAL_SPEED = FIGHTER_SPEED  # ミサイルの初速
+MISSILE_ACCELERATION_TIME = 3 * BASE_FPS  # ミサイルの加速時間（3秒）
+MISSILE_ACCELERATION_RATE = (MISSILE_MAX_SPEED - MISSILE_INITIAL_SPEED) / MISSILE_ACCELERATION_TIME  # ミサイルの加速度
+MISSILE_TURN_RATE = 45  # ミサイルの最大旋回角速度（度/秒）
+MISSILE_TURN_RATE_PER_FRAME = MISSILE_TURN_RATE / BASE_FPS
+MISSILE_MIN_SPEED = FIGHTER_SPEED * 0.8  # ミサイルが消滅する最小速度
+MISSILE_DRAG = 0.001  # 空気抵抗係数（調整可能）
+MISSILE_TURN_ENERGY_LOSS = MISSILE_TURN_RATE_PER_FRAME * 0.0005  # 旋回による1フレームあたりの速度損失（調整可能）
+RADAR_RANGE = 500  # レーダー範囲を500に設定
+RADAR_FOV = 360  # レーダーの視野角（度、360 で全周）
+RADAR_FREQUENCY = BASE_FPS  # レーダーの1秒あたりの走査回数（BASE_FPS なら毎フレーム走査）
+RADAR_STAGGER = 0.6180339887  # 戦闘機ごとに走査の位相をずらす割合（黄金比で均等に散らす）
+MAX_MISSILES = 4  # 各戦闘機が同時に発射できるミサイル数
+FIRE_COOLDOWN = 2 * BASE_FPS  # ミサイルを撃つ際に2秒のインターバル（フレーム数で設定）
+ROTATION_SPEED = 30  # 30°/秒の回転速度
+EDGE_MARGIN = 50  # 画面端の回避を始める距離（ピクセル）
+AI_TRANSIT_INTERVAL = 4  # 敵基地へ直進しているだけの戦闘機が AI の判断を行うティック間隔
+
+# 視線角速度の閾値
+LOS_RATE_THRESHOLD = 0.5  # 調整可能
+# レーダー範囲内のミサイルがこの数未満なら、脅威の候補を配列演算を使わずに1発ずつ選ぶ
+# （数発では配列を作るオーバーヘッドの方が大きいため）
+THREAT_BATCH_MIN = 16
+
+# 時間定数
+TIME_IN_SECONDS = 3.5  # ミサイルの到達可能セクターを計算する際の時間
+
+# 衝突判定の半径と、衝突判定用空間インデックスのセルサイズ
+COLLISION_RADIUS = FIGHTER_SIZE + MISSILE_SIZE
+COLLISION_CELL_SIZE = COLLISION_RADIUS * 2
+
+# ミサイルのフライアウト表（TIME_IN_SECONDS 以内の到達距離と飛翔時間。定数が変わればキャッシュが作り直される）
+MISSILE_FLYOUT = FlyoutTable.load({
+    'acceleration_time': MISSILE_ACCELERATION_TIME,
+    'acceleration_rate': MISSILE_ACCELERATION_RATE,
+    'max_speed': MISSILE_MAX_SPEED,
+    'min_speed': MISSILE_MIN_SPEED,
+    'drag': MISSILE_DRAG,
+    'turn_energy_loss': MISSILE_TURN_ENERGY_LOSS,
+    'horizon_frames': int(TIME_IN_SECONDS * BASE_FPS),
+})
+
+# チームの飛行基地はワールドの隅から BASE_OFFSET の位置（ブルーは左上、レッドは右下）
+BASE_OFFSET = 30
+
+# 角度計算関数
+def calculate_angle(dx, dy):
+    angle = math.degrees(math.atan2(dy, dx)) % 360
+    return angle
+
+# 爆発アニメーションを管理するクラス
+class Explosion:
+    __slots__ = ('x', 'y', 'frame', 'max_frames')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.frame = 0
+        self.max_frames = 6
+
+    def update(self, frames=1):
+        if self.frame < self.max_frames:
+            self.frame += frames  # シミュレーション時間でフレームを進める
+
+    def is_finished(self):
+        return self.frame >= self.max_frames
+
+def point_in_sector(point, center, radius, direction, angle_width):
+    dx = point[0] - center[0]
+    dy = point[1] - center[1]
+    distance = math.hypot(dx, dy)
+
+    if distance > radius:
+        return False  # 点が半径の外側にある
+
+    # セクターの角度幅が360度以上の場合、全ての点を含む
+    if angle_width >= 360:
+        return True
+
+    # 中心から点への角度を計算
+    point_angle = calculate_angle(dx, dy)
+
+    # セクターの開始角度と終了角度を計算
+    start_angle = (direction - angle_width / 2) % 360
+    end_angle = (direction + angle_width / 2) % 360
+
+    # 角度が跨いでいる場合を考慮
+    if start_angle <= end_angle:
+        return start_angle <= point_angle <= end_angle
+    else:
+        return point_angle >= start_angle or point_angle <= end_angle
+
+# 到達可能セクターの角度幅（飛翔を続けられる時間だけ旋回できる。最大で片側180度）
+def sector_angle_width(flight_frames):
+    max_turn_angle = np.minimum(MISSILE_TURN_RATE * flight_frames / BASE_FPS, 180)
+    return np.minimum(max_turn_angle * 2, 360)
+
+def calculate_missile_sector(missile):
+    # フライアウト表から、実際の加速・抵抗・消滅を考慮した到達距離と旋回できる範囲を引く
+    distance = MISSILE_FLYOUT.reach_distance(missile.age, missile.speed)
+    flight_frames = MISSILE_FLYOUT.flight_time(missile.age, missile.speed)
+
+    # セクター情報を返す（角度幅は sector_angle_width をスカラーで計算したもの）
+    max_turn_angle = min(MISSILE_TURN_RATE * flight_frames / BASE_FPS, 180)
+    sector = {
+        'center': (missile.x, missile.y),
+        'radius': float(distance),
+        'direction': missile.direction,  # ミサイルの進行方向
+        'angle_width': float(min(max_turn_angle * 2, 360))  # セクターの角度幅
+    }
+
+    return sector
+
+# 全ての点 × 全てのセクターの包含判定を一度に行う（point_in_sector の配列版）
+# 戻り値は [点, セクター] の bool 行列
+def points_in_sectors(px, py, cx, cy, radius, direction, angle_width):
+    dx = px[:, None] - cx[None, :]
+    dy = py[:, None] - cy[None, :]
+    inside = np.hypot(dx, dy) <= radius[None, :]
+
+    # 中心から点への角度とセクターの開始角度・終了角度
+    point_angle = np.degrees(np.arctan2(dy, dx)) % 360
+    start_angle = ((direction - angle_width / 2) % 360)[None, :]
+    end_angle = ((direction + angle_width / 2) % 360)[None, :]
+
+    # 角度が跨いでいる場合を考慮（角度幅が360度以上なら全ての点を含む）
+    in_angle = np.where(start_angle <= end_angle,
+                        (start_angle <= point_angle) & (point_angle <= end_angle),
+                        (point_angle >= start_angle) | (point_angle <= end_angle))
+    return inside & (in_angle | (angle_width >= 360)[None, :])
+
+# 2つの点がそれぞれ線分 (a0→a1), (b0→b1) 上を同じ時間で等速に動くときの最接近距離
+# 1ティック内の移動をまとめて判定するので、移動量が大きくても衝突のすり抜けが起きない
+def closest_approach(ax0, ay0, ax1, ay1, bx0, by0, bx1, by1):
+    # 相対位置 d(t) = d0 + t * v（0 <= t <= 1）の最小値を求める
+    d0x, d0y = ax0 - bx0, ay0 - by0
+    vx = (ax1 - bx1) - d0x
+    vy = (ay1 - by1) - d0y
+    vv = vx * vx + vy * vy
+    t = np.where(vv > 0, -(d0x * vx + d0y * vy) / np.where(vv > 0, vv, 1), 0)
+    t = np.minimum(np.maximum(t, 0), 1)
+    return np.hypot(d0x + t * vx, d0y + t * vy)
+
+# closest_approach の1組版（Python のスカラーで計算する）
+def closest_approach_pair(ax0, ay0, ax1, ay1, bx0, by0, bx1, by1):
+    d0x, d0y = ax0 - bx0, ay0 - by0
+    vx = (ax1 - bx1) - d0x
+    vy = (ay1 - by1) - d0y
+    vv = vx * vx + vy * vy
+    t = min(max(-(d0x * vx + d0y * vy) / vv, 0), 1) if vv > 0 else 0
+    return math.hypot(d0x + t * vx, d0y + t * vy)
+
+# 等速直線運動する点の組 (i, j) が初めて距離 radius 未満になるまでの時間（フレーム）
+# 既に radius 未満なら 0、近づかない組は inf
+def time_to_within(x, y, vx, vy, i, j, radius):
+    dx, dy = x[j] - x[i], y[j] - y[i]
+    dvx, dvy = vx[j] - vx[i], vy[j] - vy[i]
+    a = dvx * dvx + dvy * dvy
+    b = dx * dvx + dy * dvy
+    c = dx * dx + dy * dy - radius * radius
+    disc = b * b - a * c
+    approaching = (a > 0) & (b < 0) & (disc >= 0)
+    root = (-b - np.sqrt(np.maximum(disc, 0))) / np.where(a > 0, a, 1)
+    t = np.where(approaching, root, np.inf)
+    return np.where(c < 0, 0.0, np.maximum(t, 0))
+
+# 全ミサイルの到達可能セクターを1ティックに1回だけまとめて計算して保持する
+# refresh はミサイルが動いた後に毎回1回だけ呼ぶ（step の最後・skip・スナップショットの復元。World 以外から呼ばない）
+# キャッシュはその時点のミサイルの位置のもので、次の step の move_missiles までそのまま使える
+# （描画と次のティックの脅威判定がこれを引く）。ティックは持たず、呼ぶ順序でキャッシュの鮮度を保つ
+# 戦闘機とミサイルが合わせて SCALAR_LIMIT 以下なら配列では計算せず、引かれたセクターだけをミサイルの現在の状態から1発ずつ計算する
+# （refresh から次の move_missiles まではミサイルは動かないので、キャッシュと同じ値になる）
+class SectorCache:
+    def __init__(self, world):
+        self.world = world
+        self.missiles = []
+        self.batched = False  # 配列でまとめて計算したか
+        self.inside = None  # [戦闘機slot, ミサイルslot] のセクター包含判定
+
+    def refresh(self):
+        # 現在の全ミサイルのセクターを計算（calculate_missile_sector の配列版）
+        state = self.world.missile_state
+        n = state.count
+        if n == 0:
+            # 飛行中のミサイルが無ければ計算するものも無い（巡航中のほとんどのティック）
+            self.missiles = []
+            self.inside = None
+            return
+        self.missiles = list(state.objects)
+        self.inside = None
+        self.batched = self.world.fighter_state.count + n > SCALAR_LIMIT
+        if not self.batched:
+            return
+        self.x = state.x[:n].copy()
+        self.y = state.y[:n].copy()
+        self.direction = state.direction[:n].copy()
+        speed = state.speed[:n]
+        age = state.age[:n]
+
+        # フライアウト表から到達距離と角度幅をまとめて引く
+        self.radius = MISSILE_FLYOUT.reach_distance(age, speed)
+        self.angle_width = sector_angle_width(MISSILE_FLYOUT.flight_time(age, speed))
+        self.world.profiler.count('sector_computations', n)
+
+    def _cached(self, missile):
+        slot = missile.slot
+        return slot < len(self.missiles) and self.missiles[slot] is missile
+
+    def sector(self, missile):
+        # キャッシュ済みならそれを、今ティックに発射されたミサイルなら個別に計算して返す
+        if not self.batched or not self._cached(missile):
+            return calculate_missile_sector(missile)
+        slot = missile.slot
+        return {
+            'center': (self.x.item(slot), self.y.item(slot)),
+            'radius': self.radius.item(slot),
+            'direction': self.direction.item(slot),
+            'angle_width': self.angle_width.item(slot),
+        }
+
+    def update_fighters(self):
+        # 全戦闘機 × 全セクターの包含判定を1回の配列演算で求める（数発なら contains で1組ずつ判定する）
+        if not self.missiles or not self.batched:
+            return
+        fighters = self.world.fighter_state
+        f = fighters.count
+        self.inside = points_in_sectors(fighters.x[:f], fighters.y[:f], self.x, self.y,
+                                        self.radius, self.direction, self.angle_width)
+        self.world.profiler.count('sector_tests', f * len(self.x))
+
+    def contains(self, fighter, missile):
+        # 戦闘機がミサイルの到達可能セクター内にいるか
+        if self.inside is None or not self._cached(missile):
+            sector = self.sector(missile)
+            return point_in_sector((fighter.x, fighter.y), sector['center'], sector['radius'],
+                                   sector['direction'], sector['angle_width'])
+        return bool(self.inside[fighter.slot, missile.slot])
+
+# ワールドの端（bounds = (幅, 高さ)）に到達したらそれ以上進まないようにして、向きと速度の方向へ一括移動
+# 速度は1フレームあたりの移動量なので、1ティックのフレーム数 frames を掛ける
+# bounds=None なら端で止めない（ワールドに縛られない発射可能範囲の計算用）
+def advance_positions(x, y, speed, direction, mask, frames, bounds=(WIDTH, HEIGHT)):
+    radians = np.radians(direction)
+    new_x = x + speed * frames * np.cos(radians)
+    new_y = y + speed * frames * np.sin(radians)
+    if bounds is None:
+        x[:] = np.where(mask, new_x, x)
+        y[:] = np.where(mask, new_y, y)
+        return
+    width, height = bounds
+    x[:] = np.where(mask & (0 <= new_x) & (new_x <= width), new_x, x)
+    y[:] = np.where(mask & (0 <= new_y) & (new_y <= height), new_y, y)
+
+# advance_positions の1機分（Python のスカラーで計算し、移動後の位置を返す）
+def advance_position(x, y, speed, direction, frames, bounds):
+    radians = math.radians(direction)
+    new_x = x + speed * frames * math.cos(radians)
+    new_y = y + speed * frames * math.sin(radians)
+    if bounds is None:
+        return new_x, new_y
+    width, height = bounds
+    return (new_x if 0 <= new_x <= width else x), (new_y if 0 <= new_y <= height else y)
+
+# 生存している全戦闘機の旋回と移動を配列演算でまとめて行う（SCALAR_LIMIT 機以下なら1機ずつ）
+def move_fighters(fighters, frames=1, bounds=(WIDTH, HEIGHT)):
+    n = fighters.count
+    if n <= SCALAR_LIMIT:
+        move_fighters_scalar(fighters, frames, bounds)
+        return
+    alive = fighters.is_alive[:n]
+    direction = fighters.direction[:n]
+    target_direction = fighters.target_direction[:n]
+
+    # 目標方向に向かってROTATION_SPEED°/秒で回転
+    rotation_per_tick = ROTATION_SPEED / BASE_FPS * frames
+    angle_diff = (target_direction - direction + 360) % 360
+    angle_diff = np.where(angle_diff > 180, angle_diff - 360, angle_diff)
+    rotated = np.where(np.abs(angle_diff) < rotation_per_tick, target_direction,  # 目標方向に到達
+                       direction + rotation_per_tick * np.where(angle_diff > 0, 1, -1))
+    direction[:] = np.where(alive, rotated % 360, direction)
+
+    # 常に進む
+    advance_positions(fighters.x[:n], fighters.y[:n], fighters.speed[:n], direction, alive, frames, bounds)
+
+# move_fighters の1機ずつ版（状態配列をリストにして Python のスカラーで計算し、まとめて書き戻す）
+def move_fighters_scalar(fighters, frames=1, bounds=(WIDTH, HEIGHT)):
+    n = fighters.count
+    rotation_per_tick = ROTATION_SPEED / BASE_FPS * frames
+    xs, ys = fighters.x[:n].tolist(), fighters.y[:n].tolist()
+    directions = fighters.direction[:n].tolist()
+    for i, (alive, target_direction, speed) in enumerate(zip(fighters.is_alive[:n].tolist(),
+                                                           fighters.target_direction[:n].tolist(),
+                                                           fighters.speed[:n].tolist())):
+        if not alive:
+            continue
+        direction = directions[i]
+        angle_diff = (target_direction - direction + 360) % 360
+        if angle_diff > 180:
+            angle_diff -= 360
+        if abs(angle_diff) < rotation_per_tick:
+            direction = target_direction  # 目標方向に到達
+        else:
+            direction += rotation_per_tick if angle_diff > 0 else -rotation_per_tick
+        direction %= 360
+        directions[i] = direction
+        xs[i], ys[i] = advance_position(xs[i], ys[i], speed, direction, frames, bounds)
+    fighters.direction[:n] = directions
+    fighters.x[:n] = xs
+    fighters.y[:n] = ys
+
+# 全ミサイルの加速・減速・比例航法・移動を配列演算でまとめて行う（SCALAR_LIMIT 発以下なら1発ずつ）
+def move_missiles(missiles, fighters, frames=1, bounds=(WIDTH, HEIGHT)):
+    n = missiles.count
+    if n == 0:
+        return
+    if n <= SCALAR_LIMIT:
+        move_missiles_scalar(missiles, fighters, frames, bounds)
+        return
+    speed = missiles.speed[:n]
+    direction = missiles.direction[:n]
+    x = missiles.x[:n]
+    y = missiles.y[:n]
+
+    # このティックのうち加速フェーズに当たるフレーム数と、慣性飛行のフレーム数
+    age = missiles.age[:n]
+    boost_frames = np.minimum(np.maximum(MISSILE_ACCELERATION_TIME - age, 0), frames)
+    coast_frames = frames - boost_frames
+
+    # ミサイルの寿命（フレーム単位）を更新
+    age += frames
+
+    # 加速フェーズ（最大速度を超えないようにする）
+    speed[:] = np.minimum(speed + MISSILE_ACCELERATION_RATE * boost_frames, MISSILE_MAX_SPEED)
+    # 空気抵抗と旋回によるエネルギー損失（速度は0未満にならない）
+    coasting = np.maximum(speed - (MISSILE_DRAG * speed ** 2 + MISSILE_TURN_ENERGY_LOSS) * coast_frames, 0)
+    speed[:] = np.where(coast_frames > 0, coasting, speed)
+
+    # ミサイルの速度が最小速度未満になったら消滅フラグを立てる
+    too_slow = speed < MISSILE_MIN_SPEED
+    speed[too_slow] = 0
+    missiles.expired[:n] |= too_slow
+
+    # ターゲットの現在位置に向かって方向を更新（比例航法）
+    target = missiles.target_slot[:n]
+    los_angle = np.degrees(np.arctan2(fighters.y[target] - y, fighters.x[target] - x)) % 360
+    angle_diff = (los_angle - direction + 360) % 360
+    angle_diff = np.where(angle_diff > 180, angle_diff - 360, angle_diff)
+
+    # Proportional Navigationで方向を更新（旋回角速度は制限する）
+    N = 3  # ナビゲーション比（調整可能）
+    max_turn = MISSILE_TURN_RATE_PER_FRAME * frames
+    turn = np.degrees(N * np.radians(angle_diff)) / BASE_FPS * frames
+    turn = np.minimum(np.maximum(turn, -max_turn), max_turn)
+    direction[:] = (direction + turn) % 360
+
+    # ミサイルの移動
+    advance_positions(x, y, speed, direction, True, frames, bounds)
+
+# move_missiles の1発ずつ版（式は配列版と同じ）
+def move_missiles_scalar(missiles, fighters, frames=1, bounds=(WIDTH, HEIGHT)):
+    n = missiles.count
+    target_x, target_y = fighters.x[:fighters.count].tolist(), fighters.y[:fighters.count].tolist()
+    xs, ys = missiles.x[:n].tolist(), missiles.y[:n].tolist()
+    speeds, directions, ages = missiles.speed[:n].tolist(), missiles.direction[:n].tolist(), missiles.age[:n].tolist()
+    N = 3  # ナビゲーション比（move_missiles と同じ）
+    max_turn = MISSILE_TURN_RATE_PER_FRAME * frames
+    for i, target in enumerate(missiles.target_slot[:n].tolist()):
+        # 加速フェーズと慣性飛行のフレーム数
+        age = ages[i]
+        boost_frames = min(max(MISSILE_ACCELERATION_TIME - age, 0), frames)
+        coast_frames = frames - boost_frames
+        ages[i] = age + frames
+
+        # 加速・空気抵抗と旋回によるエネルギー損失・最小速度未満での消滅
+        speed = min(speeds[i] + MISSILE_ACCELERATION_RATE * boost_frames, MISSILE_MAX_SPEED)
+        if coast_frames > 0:
+            speed = max(speed - (MISSILE_DRAG * speed * speed + MISSILE_TURN_ENERGY_LOSS) * coast_frames, 0.0)
+        if speed < MISSILE_MIN_SPEED:
+            speed = 0.0
+            missiles.expired[i] = True
+        speeds[i] = speed
+
+        # 比例航法（旋回角速度は制限する）
+        x, y = xs[i], ys[i]
+        los_angle = math.degrees(math.atan2(target_y[target] - y, target_x[target] - x)) % 360
+        angle_diff = (los_angle - directions[i] + 360) % 360
+        if angle_diff > 180:
+            angle_diff -= 360
+        turn = math.degrees(N * math.radians(angle_diff)) / BASE_FPS * frames
+        direction = (directions[i] + min(max(turn, -max_turn), max_turn)) % 360
+        directions[i] = direction
+        xs[i], ys[i] = advance_position(x, y, speed, direction, frames, bounds)
+    missiles.age[:n] = ages
+    missiles.speed[:n] = speeds
+    missiles.direction[:n] = directions
+    missiles.x[:n] = xs
+    missiles.y[:n] = ys
+
+
+# 発射可能範囲の表を作るために、発射機と目標1機ずつの組を組の数だけまとめて飛ばす
+# 発射機は原点、目標は +x 方向の distance の位置。目標は姿勢角 aspect の機首方向へ直進するか、
+# evasive なら発射と同時に発射機から真っすぐ離れる方向へ旋回して逃げる
+# ミサイルと目標の運動・命中判定は World.step と同じ（ワールドの端では止めない）。戻り値は組ごとに命中したか
+def simulate_launches(distance, aspect, target_speed, evasive, max_frames):
+    n = len(distance)
+    heading = (180 + np.asarray(aspect, dtype=np.float64)) % 360
+    targets = SimpleNamespace(count=n, x=np.array(distance, dtype=np.float64), y=np.zeros(n),
+                              direction=heading.copy(), target_direction=np.zeros(n) if evasive else heading.copy(),
+                              speed=np.array(target_speed, dtype=np.float64), is_alive=np.ones(n, dtype=bool))
+    missiles = SimpleNamespace(count=n, x=np.zeros(n), y=np.zeros(n), direction=np.zeros(n),
+                               speed=np.full(n, MISSILE_INITIAL_SPEED), age=np.zeros(n),
+                               expired=np.zeros(n, dtype=bool), target_slot=np.arange(n))
+    hit = np.zeros(n, dtype=bool)
+    flying = np.ones(n, dtype=bool)
+    for _ in range(max_frames):
+        missile_x0, missile_y0 = missiles.x.copy(), missiles.y.copy()
+        move_missiles(missiles, targets, 1, bounds=None)
+        target_x0, target_y0 = targets.x.copy(), targets.y.copy()
+        move_fighters(targets, 1, bounds=None)
+        distance = closest_approach(missile_x0, missile_y0, missiles.x, missiles.y,
+                                    target_x0, target_y0, targets.x, targets.y)
+        hit |= flying & (distance < COLLISION_RADIUS)
+        flying &= ~hit & ~missiles.expired
+        if not flying.any():
+            break
+        # 命中・消滅したミサイルはその場に止める
+        missiles.speed[~flying] = 0
+    return hit
+
+
+# ミサイルの発射可能範囲の表のパラメータ（ここまでに定義した運動で作る。定数が変わればキャッシュが作り直される）
+LAUNCH_ENVELOPE_PARAMS = {
+    'acceleration_time': MISSILE_ACCELERATION_TIME,
+    'acceleration_rate': MISSILE_ACCELERATION_RATE,
+    'initial_speed': MISSILE_INITIAL_SPEED,
+    'max_speed': MISSILE_MAX_SPEED,
+    'min_speed': MISSILE_MIN_SPEED,
+    'drag': MISSILE_DRAG,
+    'turn_energy_loss': MISSILE_TURN_ENERGY_LOSS,
+    'turn_rate': MISSILE_TURN_RATE,
+    'target_turn_rate': ROTATION_SPEED,
+    'collision_radius': COLLISION_RADIUS,
+    'max_range': RADAR_RANGE * 1.2,
+    'max_target_speed': FIGHTER_SPEED * 2,
+    'max_frames': 60 * BASE_FPS,
+}
+
+
+# 発射可能範囲の表（最初の発射判断で読み込む。キャッシュに無ければそこで作る）
+@cache
+def launch_envelope():
+    return LaunchEnvelope.load(LAUNCH_ENVELOPE_PARAMS, simulate_launches)
+
+
+# ミサイルを実単位の飛行モデル（flight_model）で飛ばす場合の縮尺（World(missile_model='flight')）
+# 戦闘機の速度 FIGHTER_SPEED が飛行モデルの巡航速度（マッハ0.8）になるように決める（1ピクセル約20 m、レーダー範囲は約10 km）
+METERS_PER_PIXEL = FIGHTER_PARAMS['cruise_speed'] / (FIGHTER_SPEED * BASE_FPS)
+METERS_PER_SECOND = METERS_PER_PIXEL * BASE_FPS  # 速度 1 ピクセル/フレームの m/s
+
+
+# move_missiles の実単位版: 状態配列を m, m/s, s に直して MissileFlight でまとめて積分し、ピクセル単位に戻して書き込む
+# 目標はティックの間は等速直線運動しているとみなす
+# 近接信管の作動半径は衝突半径より狭いので、命中はワールドの衝突判定に任せ、ここでは消滅（失速・最大飛翔時間）だけを立てる
+def move_missiles_flight(missiles, fighters, frames=1, bounds=(WIDTH, HEIGHT)):
+    n = missiles.count
+    if n == 0:
+        return
+    target = missiles.target_slot[:n]
+    flight = MissileFlight(missiles.x[:n] * METERS_PER_PIXEL, missiles.y[:n] * METERS_PER_PIXEL,
+                           missiles.speed[:n] * METERS_PER_SECOND, np.radians(missiles.direction[:n]))
+    flight.time = missiles.age[:n] / BASE_FPS
+    target_heading = np.radians(fighters.direction[target])
+    target_speed = fighters.speed[target] * METERS_PER_SECOND
+    flight.step(frames / BASE_FPS, fighters.x[target] * METERS_PER_PIXEL, fighters.y[target] * METERS_PER_PIXEL,
+                target_speed * np.cos(target_heading), target_speed * np.sin(target_heading))
+
+    missiles.age[:n] += frames
+    missiles.speed[:n] = flight.speed / METERS_PER_SECOND
+    missiles.direction[:n] = np.degrees(flight.heading) % 360
+    missiles.expired[:n] |= ~flight.flying & ~flight.hit
+
+    # ワールドの端ではそれ以上進まない（advance_positions と同じ）
+    x, y = missiles.x[:n], missiles.y[:n]
+    new_x, new_y = flight.x / METERS_PER_PIXEL, flight.y / METERS_PER_PIXEL
+    width, height = bounds
+    x[:] = np.where((0 <= new_x) & (new_x <= width), new_x, x)
+    y[:] = np.where((0 <= new_y) & (new_y <= height), new_y, y)
+
+
+# ミサイルの運動モデル（World の missile_model）ごとの移動処理
+MISSILE_MODELS = {
+    'pixel': move_missiles,  # ピクセル単位の簡易モデル（3秒加速・フレームごとの抗力）
+    'flight': move_missiles_flight,  # 実単位の飛行モデル（20秒のロケットモーター・抗力・比例航法）
+}
+
+# 戦闘機クラス
+class Fighter:
+    # 属性を固定して __dict__ を持たせない（戦闘機数が多い場合のメモリと属性アクセスのため）
+    __slots__ = ('world', 'state', 'slot', 'team_color', 'squadron', 'enemy_base', 'target_direction', 'radar',
+                 'radar_range', 'missile_count', 'inbound_missiles', 'is_alive', 'last_fired_time', 'avoiding_missile',
+                 'attacking_enemy', 'avoid_direction', 'respawn_timer', 'previous_los_angles')
+
+    # 位置・向き・速度は状態配列の自分の行
+    x = array_field('x')
+    y = array_field('y')
+    direction = array_field('direction')
+    speed = array_field('speed')
+
+    def __init__(self, team_color, enemy_base, world):
+        self.world = world  # 所属するワールド（シミュレーション時刻と状態配列の参照先）
+        # 状態配列に行を確保
+        self.state = world.fighter_state
+        self.state.add(self)
+        self.state.team[self.slot] = TEAM_BLUE if team_color == BLUE else TEAM_RED
+        self.team_color = team_color
+        self.squadron = None  # 所属する飛行隊（ワールドが編成する）
+        self.enemy_base = enemy_base  # 敵の基地の座標（交戦していないときに向かう地点）
+        self.speed = FIGHTER_SPEED
+        self.radar = Radar(RADAR_RANGE, world.radar_fov, world.radar_frequency)  # 搭載レーダー
+        self.radar_range = self.radar.range
+        self.missile_count = 0  # 飛翔中の自機のミサイル数（ミサイル本体はワールドの登録簿にある）
+        self.inbound_missiles = 0  # 自機を目標にして飛翔中のミサイル数
+        self.is_alive = True
+        self.last_fired_time = 0  # 最後にミサイルを発射したフレーム
+        self.avoiding_missile = None  # 回避中のミサイルを記録
+        self.attacking_enemy = None  # 攻撃対象の敵を記録
+        self.avoid_direction = None  # 回避時の方向ベクトル
+        self.respawn_timer = 0  # リスポーンまでの残り時間
+        self.previous_los_angles = {}  # ミサイルごとの前回の視線角を記録
+        self.respawn()  # 初期位置と向きを設定
+        self.radar.stagger(self.slot * RADAR_STAGGER % 1)
+
+    def respawn(self):
+        # チームの飛行基地周辺に再配置
+        offset_range = 20  # オフセットの範囲
+        base_x, base_y = self.world.bases[self.team_color]
+        self.x = base_x + self.world.rng.uniform(-offset_range, offset_range)
+        self.y = base_y + self.world.rng.uniform(-offset_range, offset_range)
+        self.direction = 0 if self.team_color == BLUE else 180  # ブルーは右向き、レッドは左向き
+        self.is_alive = True
+        self.last_fired_time = self.world.clock.frames  # ミサイル発射時間リセット
+        self.target_direction = self.direction  # 目標方向を初期化
+        self.previous_los_angles.clear()  # 視線角の履歴をリセット
+
+    def update_respawn_timer(self):
+        if not self.is_alive:
+            self.respawn_timer -= self.world.clock.frames_per_tick
+            if self.respawn_timer <= 0:
+                self.respawn()
+
+    def avoid_screen_edges(self):
+        margin = EDGE_MARGIN  # ワールドの端からの距離（ピクセル）
+        width, height = self.world.width, self.world.height
+        x, y = self.x, self.y  # 位置は状態配列から一度だけ読む
+        avoid_vector = [0, 0]
+        if x < margin:
+            avoid_vector[0] += 1 / (x + 1e-6)
+        if x > width - margin:
+            avoid_vector[0] -= 1 / (width - x + 1e-6)
+        if y < margin:
+            avoid_vector[1] += 1 / (y + 1e-6)
+        if y > height - margin:
+            avoid_vector[1] -= 1 / (height - y + 1e-6)
+        if avoid_vector != [0, 0]:
+            avoid_angle = calculate_angle(avoid_vector[0], avoid_vector[1])
+            self.target_direction = avoid_angle
+            return True
+        return False
+
+    def bearing_in_attack_cone(self, bearing):
+        # 方位が機首の前方45度以内か
+        angle_diff = (bearing - self.direction + 360) % 360
+        if angle_diff > 180:
+            angle_diff -= 360
+        return abs(angle_diff) < 22.5
+
+    def in_launch_envelope(self, enemy, distance, bearing):
+        # 敵機が発射可能範囲の NEZ の中か（発射と同時に背を向けて逃げられても命中する距離と姿勢角）
+        aspect = aspect_angle(enemy.direction, (bearing + 180) % 360)
+        if self.world.missile_model == 'flight':
+            return flight_launch_envelope().in_no_escape_zone(distance * METERS_PER_PIXEL, aspect,
+                                                              enemy.speed * METERS_PER_SECOND)
+        return launch_envelope().in_no_escape_zone(distance, aspect, enemy.speed)
+
+    def fire_missile(self, enemy, distance=None, bearing=None):
+        # 飛行隊の交戦規定で撃てない場合は撃たない
+        if self.squadron.roe != ROE_WEAPONS_FREE:
+            return
+        # 同時に発射できるミサイル数とインターバルを確認（表を引く前に安い判定で落とす）
+        current_time = self.world.clock.frames
+        if self.missile_count >= MAX_MISSILES or current_time - self.last_fired_time < FIRE_COOLDOWN:
+            return
+        # 既にミサイルが向かっている敵機には撃たない（NEZ で撃ったミサイルは命中するので、2発目は無駄になる）
+        if enemy.inbound_missiles:
+            return
+        # 逃げられると命中しない位置では撃たない（消滅するだけのミサイルを減らす）
+        if distance is None:
+            distance = math.hypot(enemy.x - self.x, enemy.y - self.y)
+            bearing = calculate_angle(enemy.x - self.x, enemy.y - self.y)
+        if not self.in_launch_envelope(enemy, distance, bearing):
+            return
+        self.world.launch_missile(self.x, self.y, enemy, self)
+        self.world.missiles_fired += 1
+        self.last_fired_time = current_time  # 発射時間を更新
+        self.attacking_enemy = enemy  # 攻撃対象を記録
+
+    def aim_at_enemy(self, enemy, bearing=None):
+        # 敵の位置に向かって回転し、接近する（方位が計算済みならそれを使う）
+        if bearing is None:
+            bearing = calculate_angle(enemy.x - self.x, enemy.y - self.y)
+        self.target_direction = bearing
+
+    def threat_candidates(self, missiles):
+        # 自機のミサイルと、低速で到達可能セクターの外にいるミサイルを除いて（ミサイル, dx, dy）を返す（順序は保つ）
+        # 位置差と速度は状態配列からまとめて引く（ミサイル1発ずつ属性を読むより速い）
+        state = self.world.missile_state
+        sectors = self.world.sectors
+        if len(missiles) < THREAT_BATCH_MIN:
+            x, y = self.x, self.y
+            return [(missile, missile.x - x, missile.y - y) for missile in missiles
+                    if missile.owner is not self
+                    and (missile.speed >= FIGHTER_SPEED * 2.0 or sectors.contains(self, missile))]
+        slots = np.array([missile.slot for missile in missiles], dtype=np.int64)
+        dx = state.x[slots] - self.x
+        dy = state.y[slots] - self.y
+        # レーダー範囲の正確な判定は avoid_missile の math.hypot で行うので、ここでは少し広めに残す
+        keep = dx * dx + dy * dy <= (self.radar_range + 1) ** 2
+        keep &= np.array([missile.owner is not self for missile in missiles], dtype=bool)
+
+        # ミサイルの速度が自機の2.0倍未満の場合、戦闘機がセクターの範囲外なら無視（ティックごとにまとめて計算済み）
+        # キャッシュは前のティックの終わりに作るので、今ティックに発射されたミサイルはキャッシュより後ろの slot にいる
+        slow = keep & (state.speed[slots] < FIGHTER_SPEED * 2.0)
+        if sectors.inside is not None:
+            cached = slots < len(sectors.missiles)
+            check = slow & cached
+            keep[check] = sectors.inside[self.slot, slots[check]]
+            slow &= ~cached
+        for i in np.flatnonzero(slow).tolist():
+            keep[i] = sectors.contains(self, missiles[i])
+
+        picked = np.flatnonzero(keep)
+        return zip(map(missiles.__getitem__, picked.tolist()), dx[picked].tolist(), dy[picked].tolist())
+
+    def avoid_missile(self, missiles):
+        # 自分に接近しているミサイルを検知して回避行動を取る
+        avoidance_vector = [0, 0]
+        threat_detected = False
+
+        candidates = self.threat_candidates(missiles) if missiles else ()
+        for missile, dx, dy in candidates:
+            # ミサイルと戦闘機の位置差（dx, dy）から距離を求める
+            distance = math.hypot(dx, dy)
+
+            # ミサイルがレーダー範囲外なら無視
+            if distance > self.radar_range:
+                continue
+
+            # ここから先はミサイルを脅威と判断
+            # 視線角の計算
+            los_angle = calculate_angle(dx, dy)
+
+            # 前回の視線角を取得
+            previous_los_angle = self.previous_los_angles.get(missile, los_angle)
+
+            # 視線角速度の計算
+            los_rate = (los_angle - previous_los_angle + 360) % 360
+            if los_rate > 180:
+                los_rate -= 360
+            los_rate = abs(los_rate)
+
+            # 視線角速度（1フレームあたり）が小さい場合、脅威と判断
+            if los_rate < LOS_RATE_THRESHOLD * self.world.clock.frames_per_tick:
+                # 距離に反比例する重みを計算
+                weight = 1 / (distance + 1e-6)
+                # ミサイルから遠ざかるベクトルを加算
+                avoidance_vector[0] -= dx * weight
+                avoidance_vector[1] -= dy * weight
+                threat_detected = True
+                self.avoiding_missile = missile  # 回避中のミサイルを記録
+
+            # 視線角を更新
+            self.previous_los_angles[missile] = los_angle
+
+        if threat_detected:
+            # 合成された回避ベクトルの方向にターゲット方向を設定
+            avoid_angle = calculate_angle(avoidance_vector[0], avoidance_vector[1])
+            self.target_direction = avoid_angle
+            norm = math.hypot(*avoidance_vector)
+            if norm != 0:
+                self.avoid_direction = [avoidance_vector[0]/norm, avoidance_vector[1]/norm]
+            else:
+                self.avoid_direction = [0, 0]
+            return True
+        else:
+            self.avoiding_missile = None
+            self.avoid_direction = None
+            return False
+
+    def act(self, contacts, missiles):
+        if not self.is_alive:
+            return
+
+        profiler = self.world.profiler
+
+        # 画面端を回避
+        if self.avoid_screen_edges():
+            profiler.lap('avoid')
+            return  # 画面端を回避している場合、他の行動はしない
+
+        # まず、ミサイルを回避する（優先度1）
+        self.avoid_missile(missiles)
+        profiler.lap('avoid')
+        # ミサイル回避中でも攻撃は行う
+
+        # 次に、敵を攻撃する（優先度2）
+        # contacts はデータリンクの航跡表から引いた敵機と距離・方位（距離順。編隊のどれかの機が探知していれば自機の
+        # レーダーの範囲外でもよい。位置は最後に探知された時点のもの）。最も近い航跡と攻撃コーン内で最も近い航跡だけが入る
+        for enemy, distance, bearing in contacts:
+            if not self.avoiding_missile:
+                self.aim_at_enemy(enemy, bearing)
+            # ミサイル回避中は方向に関係なく攻撃可能
+            if self.avoiding_missile or self.bearing_in_attack_cone(bearing):
+                self.fire_missile(enemy, distance, bearing)
+                break  # 一度攻撃したら他の敵は無視
+
+        if not self.avoiding_missile:
+            # 敵がレーダー範囲内にいない場合、敵基地に向かう
+            dx = self.enemy_base[0] - self.x
+            dy = self.enemy_base[1] - self.y
+            angle_to_base = calculate_angle(dx, dy)
+            self.target_direction = angle_to_base
+        profiler.lap('target')
+
+# ミサイルクラス
+class Missile:
+    __slots__ = ('state', 'slot', 'id', 'target', 'owner')
+
+    # 運動の状態は状態配列の自分の行
+    x = array_field('x')
+    y = array_field('y')
+    direction = array_field('direction')
+    speed = array_field('speed')
+    age = array_field('age')
+    expired = array_field('expired')
+
+    def __init__(self, x, y, target, owner):
+        self.launch(x, y, target, owner)
+
+    def launch(self, x, y, target, owner):
+        # 発射時の状態に初期化する（プールから再利用する場合も同じ処理を通す）
+        # 状態配列に行を確保
+        self.state = owner.world.missile_state
+        self.state.add(self)
+        self.state.target_slot[self.slot] = target.slot
+        self.state.team[self.slot] = owner.world.fighter_state.team[owner.slot]
+        self.x = x
+        self.y = y
+        self.target = target
+        self.owner = owner  # 発射者を記録
+        self.age = 0  # ミサイルの経過フレーム数
+        self.speed = MISSILE_INITIAL_SPEED  # ミサイルの初速
+        self.expired = False  # ミサイルが消滅したかどうか
+        self.id = owner.world.next_missile_id  # 記録・再生で使う通し番号
+        owner.world.next_missile_id += 1
+
+        # ターゲットへの初期方向を設定
+        dx = target.x - x
+        dy = target.y - y
+        self.direction = calculate_angle(dx, dy)
+
+    def is_expired(self):
+        # ミサイルが消滅したかどうか
+        return self.expired
+
+# シミュレーション全体（描画・FPS制御なしで1ティックずつ進める）
+class World:
+    def __init__(self, fighters_per_team=3, seed=None, dt=1 / BASE_FPS, radar_fov=RADAR_FOV,
+                 radar_frequency=RADAR_FREQUENCY, ai_interval=AI_TRANSIT_INTERVAL, width=WIDTH, height=HEIGHT,
+                 missile_model='pixel'):
+        if missile_model not in MISSILE_MODELS:
+            raise ValueError(f"ミサイルの運動モデルは {list(MISSILE_MODELS)} のどれかです: {missile_model!r}")
+        self.clock = SimClock(dt, BASE_FPS)  # シミュレーション時計（全ての時間はこれを参照する）
+        # ワールドの大きさ（画面とは独立。戦闘機とミサイルはこの範囲から出ない）
+        self.width = width
+        self.height = height
+        self.bases = {BLUE: (BASE_OFFSET, BASE_OFFSET), RED: (width - BASE_OFFSET, height - BASE_OFFSET)}
+        # 全戦闘機のレーダーの視野角と走査周波数（下げると探知の精度と引き換えに速くなる）
+        self.radar_fov = radar_fov
+        self.radar_frequency = radar_frequency
+        # ミサイルの運動モデル（MISSILE_MODELS のキー）。'flight' でも戦闘機の運動と到達可能セクターの表はピクセル単位のまま
+        # （セクターの表は 'pixel' の速い加速で作られているので、加速中の 'flight' のミサイルの到達距離は大きめに見積もる）
+        self.missile_model = missile_model
+        self.move_missiles = MISSILE_MODELS[missile_model]
+        self.profiler = NULL_PROFILER  # フェーズごとの計測（profiler.Profiler を入れると有効）
+        self.rng = random.Random(seed)  # 乱数（同じシードなら同じ結果を再現できる）
+        self.fighter_state = EntityArrays(FIGHTER_FIELDS)  # 戦闘機の状態配列
+        self.missile_state = EntityArrays(MISSILE_FIELDS)  # ミサイルの状態配列（飛翔中のミサイルの登録簿を兼ねる）
+        # レーダー探知・衝突判定用の空間インデックス（毎ティック作り直す）
+        self.team_index = {TEAM_BLUE: UniformGrid(RADAR_RANGE), TEAM_RED: UniformGrid(RADAR_RANGE)}  # チームごとの戦闘機
+        self.missile_index = UniformGrid(RADAR_RANGE)
+        self.collision_index = UniformGrid(COLLISION_CELL_SIZE)
+        self.sectors = SectorCache(self)  # ミサイルの到達可能セクター
+        self.ai_scheduler = AIScheduler(ai_interval, width, height, EDGE_MARGIN)  # AI の判断頻度（1 なら全機毎ティック）
+        # 外部の方策（vec_env など）。decide(world, acting, contacts, missiles) が Fighter.act の代わりに呼ばれる
+        self.controller = None
+        self.fighters = []
+        self.explosions = []  # 爆発アニメーションのリスト
+        self.missile_pool = []  # 消滅したミサイル（次の発射で再利用する）
+        self.commands = CommandMap()  # シナリオの台本（実行時刻つきのコマンド）
+        self.finished = False  # シナリオが終わったか（EndScenario コマンドで立つ）
+
+        # ブルーチームの戦闘機を作成
+        for i in range(fighters_per_team):
+            fighter = Fighter(BLUE, self.bases[RED], self)
+            fighter.respawn_timer = i * BASE_FPS  # 1秒おきにリスポーン
+            fighter.is_alive = False  # 最初は待機状態
+            self.fighters.append(fighter)
+
+        # レッドチームの戦闘機を作成
+        for i in range(fighters_per_team):
+            fighter = Fighter(RED, self.bases[BLUE], self)
+            fighter.respawn_timer = i * BASE_FPS  # 1秒おきにリスポーン
+            fighter.is_alive = False  # 最初は待機状態
+            self.fighters.append(fighter)
+
+        # チームごとの飛行隊（データリンクで航跡表を共有する）
+        self.squadrons = {
+            TEAM_BLUE: Squadron(BLUE, self.fighters[:fighters_per_team]),
+            TEAM_RED: Squadron(RED, self.fighters[fighters_per_team:]),
+        }
+        for squadron in self.squadrons.values():
+            for fighter in squadron.aircrafts:
+                fighter.squadron = squadron
+
+        # 戦闘結果の集計
+        self.kills = {BLUE: 0, RED: 0}  # チームごとの撃墜数
+        self.missiles_fired = 0  # 発射されたミサイル数
+        self.next_missile_id = 0  # 次に発射するミサイルの通し番号
+        self.missiles_expired = 0  # 命中せずに消滅したミサイル数
+        self.first_kill_time = None  # 最初の撃墜が起きたシミュレーション時刻（秒）
+        self.sectors.refresh()
+
+    @property
+    def tick(self):
+        return self.clock.tick
+
+    @property
+    def missiles(self):
+        # 飛翔中の全ミサイル（登録簿の slot 順）
+        return list(self.missile_state.objects)
+
+    def launch_missile(self, x, y, target, owner):
+        # 消滅したミサイルのオブジェクトがあれば再利用して発射する（発射ごとの生成と GC を減らす）
+        # 登録簿への追加は Missile.launch が行い、ここでは発射者ごと・目標ごとの数を数える
+        if self.missile_pool:
+            missile = self.missile_pool.pop()
+            missile.launch(x, y, target, owner)
+        else:
+            missile = Missile(x, y, target, owner)
+        if self.missile_model == 'flight':
+            # 実単位のミサイルは発射可能範囲の表と同じく、目標の未来位置へ見越し角をとって撃つ
+            heading = lead_heading(target.x - x, target.y - y, math.radians(target.direction),
+                                   target.speed * METERS_PER_SECOND)
+            missile.direction = math.degrees(heading) % 360
+        owner.missile_count += 1
+        target.inbound_missiles += 1
+        return missile
+
+    def remove_missiles(self, removed):
+        # ミサイルを登録簿から swap-remove で削除して、オブジェクトをプールへ戻す
+        # 消滅したミサイルの視線角の履歴と回避中の記録も先に消しておく（再利用されたオブジェクトが古い値を引かないように）
+        removed_set = set(removed)
+        for fighter in self.fighters:
+            los_angles = fighter.previous_los_angles
+            if los_angles:
+                for missile in removed:
+                    los_angles.pop(missile, None)
+            if fighter.avoiding_missile in removed_set:
+                fighter.avoiding_missile = None
+                fighter.avoid_direction = None
+        state = self.missile_state
+        for missile in removed:
+            missile.owner.missile_count -= 1
+            missile.target.inbound_missiles -= 1
+            state.remove(missile.slot)
+        self.missile_pool.extend(removed)
+
+    def scramble(self, team, count):
+        # 待機中（リスポーン待ち）の戦闘機を最大 count 機、ただちに基地から発進させる
+        for fighter in self.squadrons[team].aircrafts:
+            if count <= 0:
+                break
+            if not fighter.is_alive:
+                fighter.respawn()
+                count -= 1
+
+    def set_destination(self, team, destination):
+        # 飛行隊の全機が交戦していないときに向かう地点を変える
+        for fighter in self.squadrons[team].aircrafts:
+            fighter.enemy_base = destination
+        self.ai_scheduler.invalidate()
+
+    def update_spatial_index(self):
+        # 生存している戦闘機と飛翔中のミサイルの現在位置で空間インデックスを作り直す
+        # 戦闘機とミサイルが合わせて SCALAR_LIMIT 以下のティックは作らない（探知と衝突判定は全組を1組ずつ調べる）
+        fighters, missiles = self.fighter_state, self.missile_state
+        fighters.load('is_alive')
+        self.scalar = fighters.count + missiles.count <= SCALAR_LIMIT
+        if self.scalar:
+            self.alive_slots = [fighter.slot for fighter in fighters.objects if fighter.is_alive]
+            return
+        alive = np.flatnonzero(fighters.is_alive[:fighters.count])
+        self.alive_slots = alive
+        team = fighters.team[alive]
+        for team_id, index in self.team_index.items():
+            members = alive[team == team_id]
+            index.rebuild(fighters.x[members], fighters.y[members], members)
+        self.collision_index.rebuild(fighters.x[alive], fighters.y[alive], alive)
+        n = missiles.count
+        self.missile_index.rebuild(missiles.x[:n], missiles.y[:n], np.arange(n))
+
+    def _query_from_alive(self, index, radius):
+        # 生存している戦闘機ごとに、半径内にある登録点の slot 配列を返す（戦闘機の slot で引ける）
+        fighters = self.fighter_state
+        alive = self.alive_slots
+        qi, ids = index.query(fighters.x[alive], fighters.y[alive], radius)
+        self.profiler.count('radar_pairs', len(qi))
+        found = [()] * fighters.count
+        for slot, near in zip(alive.tolist(), split_by_query(qi, ids, len(alive))):
+            found[slot] = near
+        return found
+
+    def radar_contacts(self):
+        # チームごとのデータリンクで、このティックに走査するレーダーの探知から航跡表を更新し、
+        # 戦闘機ごとに航跡表から引いた [(敵機, 距離, 方位)]（距離順）を返す（戦闘機の slot で引ける）
+        state = self.fighter_state
+        contacts = [()] * state.count
+        for team, squadron in self.squadrons.items():
+            enemy_index = None if self.scalar else self.team_index[TEAM_RED if team == TEAM_BLUE else TEAM_BLUE]
+            self.profiler.count('radar_pairs', squadron.update_tracks(state, enemy_index, self.clock.time))
+            for slot, near in squadron.contacts.items():
+                contacts[slot] = near
+        return contacts
+
+    def missiles_in_radar(self):
+        # 戦闘機ごとのレーダー範囲内のミサイル
+        if self.scalar:
+            return self._missiles_in_radar_scalar()
+        objects = self.missile_state.objects
+        return [[objects[j] for j in near] for near in self._query_from_alive(self.missile_index, RADAR_RANGE)]
+
+    def _missiles_in_radar_scalar(self):
+        # missiles_in_radar の空間インデックスを使わない版（生存機 × ミサイルを1組ずつ調べる。ミサイルは slot 順）
+        fighters, missiles = self.fighter_state, self.missile_state
+        nearby = [[] for _ in range(fighters.count)]
+        n = missiles.count
+        if n == 0:
+            return nearby
+        fx, fy = fighters.x[:fighters.count].tolist(), fighters.y[:fighters.count].tolist()
+        points = list(zip(missiles.objects, missiles.x[:n].tolist(), missiles.y[:n].tolist()))
+        radius2 = RADAR_RANGE * RADAR_RANGE
+        for slot in self.alive_slots:
+            x, y = fx[slot], fy[slot]
+            near = nearby[slot]
+            for missile, mx, my in points:
+                dx, dy = mx - x, my - y
+                if dx * dx + dy * dy <= radius2:
+                    near.append(missile)
+        self.profiler.count('radar_pairs', sum(map(len, nearby)))
+        return nearby
+
+    def collision_hits(self, missile_x0, missile_y0, fighter_x0, fighter_y0):
+        # このティックのミサイルの移動線分と敵戦闘機の移動線分の最接近距離で命中を判定する
+        # 戻り値はミサイルごとの命中した戦闘機のリスト（ミサイルの slot で引ける）
+        missiles, fighters = self.missile_state, self.fighter_state
+        n, f = missiles.count, fighters.count
+        if n == 0:
+            return []
+        if self.scalar:
+            return self._collision_hits_scalar(missile_x0, missile_y0, fighter_x0, fighter_y0)
+        mx, my = missiles.x[:n], missiles.y[:n]
+        fx, fy = fighters.x[:f], fighters.y[:f]
+
+        # 粗い判定: 線分の始点同士が「衝突半径 + 両者の最大移動量」以内の組だけを候補にする
+        missile_step = np.hypot(mx - missile_x0, my - missile_y0).max()
+        fighter_step = np.hypot(fx - fighter_x0, fy - fighter_y0).max() if f else 0.0
+        reach = COLLISION_RADIUS + missile_step + fighter_step
+        qi, j = self.collision_index.query(missile_x0, missile_y0, reach)
+
+        # 詳細な判定: 別チームで、最接近距離が衝突半径未満の組
+        enemy = missiles.team[qi] != fighters.team[j]
+        qi, j = qi[enemy], j[enemy]
+        self.profiler.count('collision_pairs', len(qi))
+        distance = closest_approach(missile_x0[qi], missile_y0[qi], mx[qi], my[qi],
+                                    fighter_x0[j], fighter_y0[j], fx[j], fy[j])
+        hit = distance < COLLISION_RADIUS
+        objects = fighters.objects
+        return [[objects[k] for k in near] for near in split_by_query(qi[hit], j[hit], n)]
+
+    def _collision_hits_scalar(self, missile_x0, missile_y0, fighter_x0, fighter_y0):
+        # collision_hits の空間インデックスを使わない版（ミサイル × 生存していた敵機を1組ずつ調べる）
+        missiles, fighters = self.missile_state, self.fighter_state
+        n, f = missiles.count, fighters.count
+        objects = fighters.objects
+        team, x0, y0 = fighters.team[:f].tolist(), fighter_x0.tolist(), fighter_y0.tolist()
+        x1, y1 = fighters.x[:f].tolist(), fighters.y[:f].tolist()
+        fighter_segments = [(slot, team[slot], x0[slot], y0[slot], x1[slot], y1[slot]) for slot in self.alive_slots]
+        hits = []
+        pairs = 0
+        for missile_team, mx0, my0, mx1, my1 in zip(missiles.team[:n].tolist(), missile_x0.tolist(),
+                                                    missile_y0.tolist(), missiles.x[:n].tolist(),
+                                                    missiles.y[:n].tolist()):
+            near = []
+            for slot, fighter_team, fx0, fy0, fx1, fy1 in fighter_segments:
+                if fighter_team == missile_team:
+                    continue
+                pairs += 1
+                if closest_approach_pair(mx0, my0, mx1, my1, fx0, fy0, fx1, fy1) < COLLISION_RADIUS:
+                    near.append(objects[slot])
+            hits.append(near)
+        self.profiler.count('collision_pairs', pairs)
+        return hits
+
+    def quiet_ticks(self):
+        # 何も起きない（全機が敵基地へ直進しているだけの）ティック数を解析的に求める
+        # 次の事象（敵機のレーダー範囲進入・画面端回避・敵基地到達・リスポーン・台本のコマンド）の1ティック前まで
+        if self.missile_state.count or self.finished:
+            return 0
+        # 走査の間に保持している探知があれば、それに基づいて攻撃する可能性がある
+        if any(len(squadron.track_enemy) for squadron in self.squadrons.values()):
+            return 0
+        state = self.fighter_state
+        n = state.count
+        state.load('is_alive')
+        x, y, speed = state.x[:n], state.y[:n], state.speed[:n]
+        alive = state.is_alive[:n]
+        frames_per_tick = self.clock.frames_per_tick
+        horizon = np.inf  # 次の事象までのフレーム数
+
+        # 台本の次のコマンド（実行時刻を迎えるティックは飛ばさない）
+        next_command = self.commands.next_time()
+        if next_command < math.inf:
+            horizon = (next_command - SCHEDULE_EPSILON - self.clock.time) * self.clock.frame_rate
+
+        # リスポーン待ちの戦闘機
+        for fighter in self.fighters:
+            if not fighter.is_alive:
+                horizon = min(horizon, fighter.respawn_timer)
+
+        live = np.flatnonzero(alive)
+        if len(live) == 0:
+            return max(math.ceil(horizon / frames_per_tick) - 1, 0) if horizon < np.inf else 0
+
+        # 生存機は画面端の外にいて、敵基地への方位へ向き終わっている必要がある
+        turn_per_tick = ROTATION_SPEED / BASE_FPS * frames_per_tick
+        for slot in live.tolist():
+            fighter = state.objects[slot]
+            if fighter.avoiding_missile:
+                return 0
+            bearing = calculate_angle(fighter.enemy_base[0] - fighter.x, fighter.enemy_base[1] - fighter.y)
+            diff = (bearing - fighter.direction + 180) % 360 - 180
+            if abs(diff) >= turn_per_tick or fighter.direction != fighter.target_direction:
+                return 0
+            distance = math.hypot(fighter.enemy_base[0] - fighter.x, fighter.enemy_base[1] - fighter.y)
+            horizon = min(horizon, distance / fighter.speed)
+        lx, ly, ls = x[live], y[live], speed[live]
+        width, height = self.width, self.height
+        if (np.any(lx < EDGE_MARGIN) or np.any(lx > width - EDGE_MARGIN)
+                or np.any(ly < EDGE_MARGIN) or np.any(ly > height - EDGE_MARGIN)):
+            return 0
+
+        # 画面端の回避領域に入るまで
+        radians = np.radians(state.direction[live])
+        vx, vy = ls * np.cos(radians), ls * np.sin(radians)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tx = np.where(vx > 0, (width - EDGE_MARGIN - lx) / vx, np.where(vx < 0, (EDGE_MARGIN - lx) / vx, np.inf))
+            ty = np.where(vy > 0, (height - EDGE_MARGIN - ly) / vy, np.where(vy < 0, (EDGE_MARGIN - ly) / vy, np.inf))
+        horizon = min(horizon, tx.min(), ty.min())
+
+        # 敵機同士がレーダー範囲に入るまで
+        team = state.team[live]
+        i, j = np.nonzero(team[:, None] < team[None, :])
+        if len(i):
+            horizon = min(horizon, time_to_within(lx, ly, vx, vy, i, j, RADAR_RANGE).min())
+
+        if horizon == np.inf:
+            return 0
+        # 事象が起きるティックは通常の step() で処理する
+        return max(math.ceil(horizon / frames_per_tick) - 1, 0)
+
+    def skip(self, ticks):
+        # quiet_ticks() の範囲内で、直進とタイマーの経過を1回の計算で進める
+        frames = ticks * self.clock.frames_per_tick
+        self.clock.advance(ticks)
+        for explosion in self.explosions:
+            explosion.update(frames)
+        self.explosions = [exp for exp in self.explosions if not exp.is_finished()]
+        for fighter in self.fighters:
+            if not fighter.is_alive:
+                fighter.respawn_timer -= frames
+            else:
+                fighter.radar.catch_up(self.clock.time)
+        state = self.fighter_state
+        state.load('is_alive')
+        n = state.count
+        advance_positions(state.x[:n], state.y[:n], state.speed[:n], state.direction[:n],
+                          state.is_alive[:n], frames, (self.width, self.height))
+        self.sectors.refresh()
+
+    def fast_forward(self, max_ticks):
+        # 何も起きない区間を最大 max_ticks ティック分だけ飛ばし、飛ばしたティック数を返す
+        ticks = min(self.quiet_ticks(), max_ticks)
+        if ticks > 0:
+            self.skip(ticks)
+        return ticks
+
+    def step(self):
+        fighters = self.fighters
+        profiler = self.profiler
+        self.clock.advance()
+        frames = self.clock.frames_per_tick
+
+        # 実行時刻を迎えた台本のコマンドだけを実行する
+        self.commands.execute_commands(self, self.clock.time)
+
+        # 爆発アニメーションを進める
+        for explosion in self.explosions:
+            explosion.update(frames)
+        self.explosions = [exp for exp in self.explosions if not exp.is_finished()]
+
+        # リスポーン待ちの戦闘機を処理
+        for fighter in fighters:
+            fighter.update_respawn_timer()
+        profiler.lap('respawn')
+
+        # 空間インデックスから、各戦闘機のレーダー範囲内の敵機とミサイルだけを取り出す
+        self.update_spatial_index()
+        profiler.count('fighters_alive', len(self.alive_slots))
+        profiler.count('missiles_alive', self.missile_state.count)
+        contacts = self.radar_contacts()
+        nearby_missiles = self.missiles_in_radar()
+        self.sectors.update_fighters()
+        profiler.lap('detect')
+
+        # 戦闘機の行動を実行（巡航しているだけの機体は数ティックに1回）
+        acting = self.ai_scheduler.select(self.fighter_state, self.tick, contacts, nearby_missiles)
+        profiler.count('ai_decisions', len(acting))
+        if self.controller is None:
+            for fighter in acting:
+                fighter.act(contacts[fighter.slot], nearby_missiles[fighter.slot])
+        else:
+            self.controller.decide(self, acting, contacts, nearby_missiles)
+
+        # 全ミサイルをまとめて移動（衝突判定用に移動前の位置を残す）
+        missiles = self.missile_state
+        missile_x0 = missiles.x[:missiles.count].copy()
+        missile_y0 = missiles.y[:missiles.count].copy()
+        self.move_missiles(missiles, self.fighter_state, frames, (self.width, self.height))
+        profiler.lap('missile_move')
+
+        # 生存している戦闘機をまとめて移動（衝突判定用に移動前の位置を残す）
+        # 生死は update_spatial_index で読み込み済みなので、AI が変えた目標方向だけを読み込む
+        state = self.fighter_state
+        state.load('target_direction')
+        fighter_x0 = state.x[:state.count].copy()
+        fighter_y0 = state.y[:state.count].copy()
+        move_fighters(state, frames, (self.width, self.height))
+        profiler.lap('fighter_move')
+
+        # ミサイルの衝突判定（ティック内の移動線分同士の最接近距離で判定）
+        hits = self.collision_hits(missile_x0, missile_y0, fighter_x0, fighter_y0)
+        missiles_to_remove = []  # 削除するミサイル（命中と消滅が重なっても1回だけ入れる）
+        for missile in missiles.objects:
+            hit = False
+            for enemy in hits[missile.slot]:
+                if enemy.is_alive:
+                    self.explosions.append(Explosion(enemy.x, enemy.y))  # 爆発をリストに追加
+                    enemy.is_alive = False
+                    enemy.respawn_timer = BASE_FPS  # 1秒後にリスポーン
+                    self.kills[missile.owner.team_color] += 1
+                    if self.first_kill_time is None:
+                        self.first_kill_time = self.clock.time
+                    hit = True
+
+            # 命中したか、消滅条件を満たしたミサイルを削除リストに追加
+            if missile.is_expired():
+                if not hit:
+                    self.missiles_expired += 1
+                missiles_to_remove.append(missile)
+            elif hit:
+                missiles_to_remove.append(missile)
+        profiler.lap('collision')
+
+        # 削除用リストに追加したミサイルを登録簿から削除
+        if missiles_to_remove:
+            self.remove_missiles(missiles_to_remove)
+        profiler.lap('removal')
+
+        # 次のティック（と描画）で使うミサイルのセクターを計算
+        self.sectors.refresh()
+        profiler.lap('sectors')
+
+    def run(self, ticks, time_skip=False):
+        # 指定ティック数を可能な限り高速に進める
+        # time_skip=True なら何も起きない巡航区間を解析的に飛ばす
+        # 台本の EndScenario が実行されたらそのティックで止まる
+        while ticks > 0 and not self.finished:
+            if time_skip:
+                ticks -= self.fast_forward(ticks)
+                if ticks == 0:
+                    break
+            self.step()
+            ticks -= 1
+
+    def run_for(self, seconds, time_skip=False):
+        # 指定したシミュレーション時間（秒）だけ進める
+        self.run(round(seconds / self.clock.dt), time_skip)
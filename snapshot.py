@@ -0,0 +1,134 @@
+from operator import attrgetter
+
+from simulation import Explosion, Missile, World
+
+# ワールドの全状態のスナップショットと復元
+# 1つのスナップショットから何本でも分岐シミュレーション（「2秒早く撃っていたら」など）を続けられる
+# オブジェクト間の参照は ID で保存する（戦闘機は slot、ミサイルは通し番号 id）
+# スナップショットは数値とタプル（と台本の単純なコマンドオブジェクト）だけでできているので、そのまま pickle して別プロセスへ渡せる
+
+# 戦闘機・ミサイルごとに保存する属性
+FIGHTER_ATTRS = ('x', 'y', 'direction', 'target_direction', 'speed', 'is_alive',
+                 'last_fired_time', 'respawn_timer', 'enemy_base')
+MISSILE_ATTRS = ('id', 'x', 'y', 'direction', 'speed', 'age', 'expired')
+
+_fighter_values = attrgetter(*FIGHTER_ATTRS)
+_missile_values = attrgetter(*MISSILE_ATTRS)
+
+
+class Snapshot:
+    def __init__(self, world):
+        self.fighters_per_team = len(world.fighters) // 2
+        self.dt = world.clock.dt
+        self.radar = (world.radar_fov, world.radar_frequency)
+        self.ai_interval = world.ai_scheduler.interval
+        self.size = (world.width, world.height)
+        self.missile_model = world.missile_model
+        self.tick = world.tick
+        self.rng_state = world.rng.getstate()
+        self.stats = (dict(world.kills), world.missiles_fired, world.missiles_expired,
+                      world.first_kill_time, world.next_missile_id)
+        self.explosions = [(e.x, e.y, e.frame) for e in world.explosions]
+        # まだ実行していない台本のコマンド（コマンドは実行しても変わらないので共有してよい）
+        self.commands = (list(world.commands.commands), world.commands.order, world.finished)
+
+        # 飛翔中のミサイル（状態配列の slot 順に保存し、復元後も同じ順序で処理されるようにする）
+        self.missiles = [(_missile_values(m), m.owner.slot, m.target.slot)
+                         for m in world.missile_state.objects]
+
+        # 戦闘機（参照はすべて ID に置き換える）
+        self.fighters = []
+        for fighter in world.fighters:
+            self.fighters.append((
+                _fighter_values(fighter),
+                fighter.avoiding_missile.id if fighter.avoiding_missile else None,
+                list(fighter.avoid_direction) if fighter.avoid_direction else fighter.avoid_direction,
+                fighter.attacking_enemy.slot if fighter.attacking_enemy else None,
+                {m.id: angle for m, angle in fighter.previous_los_angles.items()},
+                fighter.radar.next_scan,
+            ))
+
+        # データリンクの航跡表（走査の間も使われる）
+        self.squadrons = {team: (squadron.track_enemy.copy(), squadron.track_x.copy(), squadron.track_y.copy(),
+                                 squadron.track_time.copy())
+                          for team, squadron in world.squadrons.items()}
+        self.roe = {team: squadron.roe for team, squadron in world.squadrons.items()}
+
+
+# ワールドの現在の状態をスナップショットとして取り出す
+def take_snapshot(world):
+    return Snapshot(world)
+
+
+# スナップショットの状態をワールドへ書き戻す（同じ戦闘機数・dt・レーダー設定・大きさ・ミサイルの運動モデルのワールドであること）
+def restore_snapshot(world, snapshot):
+    if (len(world.fighters) != len(snapshot.fighters) or world.clock.dt != snapshot.dt
+            or (world.radar_fov, world.radar_frequency) != snapshot.radar
+            or (world.width, world.height) != snapshot.size or world.missile_model != snapshot.missile_model):
+        raise ValueError("スナップショットと戦闘機数・dt・レーダー設定・大きさ・ミサイルの運動モデルが異なるワールドには復元できません")
+
+    world.clock.tick = snapshot.tick
+    world.rng.setstate(snapshot.rng_state)
+    kills, world.missiles_fired, world.missiles_expired, world.first_kill_time, world.next_missile_id = snapshot.stats
+    world.kills = dict(kills)
+    world.explosions = []
+    for x, y, frame in snapshot.explosions:
+        explosion = Explosion(x, y)
+        explosion.frame = frame
+        world.explosions.append(explosion)
+    commands, world.commands.order, world.finished = snapshot.commands
+    world.commands.commands = list(commands)
+
+    # ミサイルを作り直す（Missile.__init__ は発射処理を含むので通さない）
+    fighters = world.fighters
+    state = world.missile_state
+    world.missile_pool.extend(state.objects)
+    for slot in reversed(range(state.count)):
+        state.remove(slot)
+    by_id = {}
+    for values, owner, target in snapshot.missiles:
+        missile = world.missile_pool.pop() if world.missile_pool else Missile.__new__(Missile)
+        missile.state = state
+        state.add(missile)
+        for name, value in zip(MISSILE_ATTRS, values):
+            setattr(missile, name, value)
+        missile.owner = fighters[owner]
+        missile.target = fighters[target]
+        state.target_slot[missile.slot] = target
+        state.team[missile.slot] = world.fighter_state.team[owner]
+        by_id[missile.id] = missile
+
+    for fighter in fighters:
+        fighter.missile_count = 0
+        fighter.inbound_missiles = 0
+    for missile in by_id.values():
+        missile.owner.missile_count += 1
+        missile.target.inbound_missiles += 1
+
+    for fighter, (values, avoiding, avoid_direction, attacking, los_angles, next_scan) in zip(fighters, snapshot.fighters):
+        for name, value in zip(FIGHTER_ATTRS, values):
+            setattr(fighter, name, value)
+        fighter.avoid_direction = list(avoid_direction) if avoid_direction else avoid_direction
+        fighter.attacking_enemy = fighters[attacking] if attacking is not None else None
+        fighter.radar.next_scan = next_scan
+        # 消滅済みのミサイルは二度と現れないので、その視線角の履歴は復元しない
+        fighter.previous_los_angles = {by_id[i]: angle for i, angle in los_angles.items() if i in by_id}
+        # 回避中のミサイルは飛翔中のもの（消滅したミサイルの記録は World.remove_missiles が消している）
+        fighter.avoiding_missile = by_id.get(avoiding)
+
+    world.fighter_state.load('target_direction', 'is_alive')
+    for team, squadron in world.squadrons.items():
+        squadron.set_tracks(*(array.copy() for array in snapshot.squadrons[team]))
+        squadron.contacts = {}  # 各機の contacts は次の step で航跡表から作り直される
+        squadron.roe = snapshot.roe[team]
+    world.ai_scheduler.invalidate()
+    world.sectors.refresh()
+    return world
+
+
+# スナップショットから新しいワールドを作る（元のワールドには影響しない）
+def fork(snapshot):
+    world = World(snapshot.fighters_per_team, dt=snapshot.dt, radar_fov=snapshot.radar[0],
+                  radar_frequency=snapshot.radar[1], ai_interval=snapshot.ai_interval, width=snapshot.size[0],
+                  height=snapshot.size[1], missile_model=snapshot.missile_model)
+    return restore_snapshot(world, snapshot)
@@ -0,0 +1,135 @@
+import numpy as np
+
+# 一様グリッドによる空間インデックス
+# 点をセルごとにソートして保持し、半径内の候補だけを配列演算で取り出す
+
+# 問い合わせ点数 × 登録点数がこの値以下なら、グリッドを使わずに総当たりで計算する
+# （数機同士の戦闘ではセル探索のオーバーヘッドの方が大きいため）
+BRUTE_FORCE_LIMIT = 4096
+
+# セル座標 (cx, cy) を1つの整数キーにまとめるための係数
+_KEY_STRIDE = 1 << 32
+_KEY_OFFSET = 1 << 31
+
+
+class UniformGrid:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.rebuild(np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int64))
+
+    def _cell_keys(self, x, y):
+        cx = np.floor(x / self.cell_size).astype(np.int64)
+        cy = np.floor(y / self.cell_size).astype(np.int64)
+        return cx * _KEY_STRIDE + (cy + _KEY_OFFSET)
+
+    def rebuild(self, x, y, ids):
+        # ids の点を登録し直す（x, y は ids と同じ長さの座標配列、ids は昇順）
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.x = np.array(x, dtype=np.float64)
+        self.y = np.array(y, dtype=np.float64)
+        self._sorted = None  # セル順の並びは必要になった時に作る
+
+    def _sort_by_cell(self):
+        if self._sorted is None:
+            keys = self._cell_keys(self.x, self.y)
+            order = np.argsort(keys, kind='stable')
+            self._sorted = (keys[order], order)
+        return self._sorted
+
+    def _query_brute_force(self, qx, qy, radius):
+        # 全組の距離を行列で計算（結果は問い合わせ点順・id 順に並ぶ）
+        dx = self.x[None, :] - qx[:, None]
+        dy = self.y[None, :] - qy[:, None]
+        qi, j = np.nonzero(dx * dx + dy * dy <= radius * radius)
+        return qi, self.ids[j]
+
+    def _query_cells(self, qx, qy, radius):
+        # 問い合わせ点の周囲セルに入っている点を候補として列挙
+        keys, order = self._sort_by_cell()
+        reach = int(np.ceil(radius / self.cell_size))
+        qcx = np.floor(qx / self.cell_size).astype(np.int64)
+        qcy = np.floor(qy / self.cell_size).astype(np.int64)
+        nq = len(qx)
+        qi_parts, j_parts = [], []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                cell = (qcx + dx) * _KEY_STRIDE + (qcy + dy + _KEY_OFFSET)
+                start = np.searchsorted(keys, cell, 'left')
+                counts = np.searchsorted(keys, cell, 'right') - start
+                total = counts.sum()
+                if total == 0:
+                    continue
+                # 各問い合わせ点について start..start+count-1 を展開
+                first = np.cumsum(counts) - counts
+                qi_parts.append(np.repeat(np.arange(nq), counts))
+                j_parts.append(order[np.repeat(start - first, counts) + np.arange(total)])
+        if not qi_parts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        qi = np.concatenate(qi_parts)
+        j = np.concatenate(j_parts)
+
+        # 候補の中から実際に半径内にあるものだけを残す
+        dx = self.x[j] - qx[qi]
+        dy = self.y[j] - qy[qi]
+        inside = dx * dx + dy * dy <= radius * radius
+        qi = qi[inside]
+        ids = self.ids[j[inside]]
+        order = np.lexsort((ids, qi))
+        return qi[order], ids[order]
+
+    def _covered_cells(self, qx, qy, radius):
+        # _query_cells と同じ候補の列挙で、組を並べずに半径内に入った登録点へ印を付ける
+        keys, order = self._sort_by_cell()
+        reach = int(np.ceil(radius / self.cell_size))
+        qcx = np.floor(qx / self.cell_size).astype(np.int64)
+        qcy = np.floor(qy / self.cell_size).astype(np.int64)
+        nq = len(qx)
+        covered = np.zeros(len(self.ids), dtype=bool)
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                cell = (qcx + dx) * _KEY_STRIDE + (qcy + dy + _KEY_OFFSET)
+                start = np.searchsorted(keys, cell, 'left')
+                counts = np.searchsorted(keys, cell, 'right') - start
+                total = counts.sum()
+                if total == 0:
+                    continue
+                first = np.cumsum(counts) - counts
+                qi = np.repeat(np.arange(nq), counts)
+                j = order[np.repeat(start - first, counts) + np.arange(total)]
+                ex = self.x[j] - qx[qi]
+                ey = self.y[j] - qy[qi]
+                covered[j[ex * ex + ey * ey <= radius * radius]] = True
+        return covered
+
+    def covered(self, qx, qy, radius):
+        # 登録点ごとに、どれかの問い合わせ点から半径 radius 以内にあるか（登録順の bool 配列）
+        # 組の一覧が要らない場合の query()（組を並べ替えないので、密集して組が多いときに速い）
+        qx = np.asarray(qx, dtype=np.float64)
+        qy = np.asarray(qy, dtype=np.float64)
+        if len(qx) == 0 or len(self.ids) == 0:
+            return np.zeros(len(self.ids), dtype=bool)
+        if len(qx) * len(self.ids) <= BRUTE_FORCE_LIMIT:
+            dx = self.x[None, :] - qx[:, None]
+            dy = self.y[None, :] - qy[:, None]
+            return (dx * dx + dy * dy <= radius * radius).any(axis=0)
+        return self._covered_cells(qx, qy, radius)
+
+    def query(self, qx, qy, radius):
+        # 各問い合わせ点から半径 radius 以内にある登録点の組を返す
+        # 戻り値 (qi, ids) は問い合わせ点の番号順、同じ点の中では id 順に並ぶ
+        qx = np.asarray(qx, dtype=np.float64)
+        qy = np.asarray(qy, dtype=np.float64)
+        if len(qx) == 0 or len(self.ids) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        if len(qx) * len(self.ids) <= BRUTE_FORCE_LIMIT:
+            return self._query_brute_force(qx, qy, radius)
+        return self._query_cells(qx, qy, radius)
+
+
+def split_by_query(qi, ids, n_queries):
+    # query() の結果を問い合わせ点ごとの id のリストに分ける
+    bounds = np.searchsorted(qi, np.arange(n_queries + 1)).tolist()
+    ids = ids.tolist()
+    return [ids[start:end] for start, end in zip(bounds, bounds[1:])]
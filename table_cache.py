@@ -0,0 +1,36 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# 事前計算した表（フライアウト表・発射可能範囲の表）のディスクキャッシュ
+# 表は名前 → NumPy 配列の辞書として、パラメータと表の形（格子点数や表の版）のハッシュを名前にしたファイルに置く
+# パラメータや定数が変われば別の名前になるので、古い表を読むことはなく自動で作り直される
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'AirTacticalSim')
+
+
+def params_hash(params, layout):
+    text = json.dumps({**layout, **params}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+# kind の表をキャッシュから読み込み、なければ build() で作って保存する
+# names は表の配列の名前、build() は同じ名前の配列の辞書を返す
+def load_table(kind, params, layout, names, build, cache_dir=CACHE_DIR):
+    path = os.path.join(cache_dir, f"{kind}-{params_hash(params, layout)}.npz")
+    try:
+        with np.load(path) as data:
+            return {name: data[name] for name in names}
+    except (OSError, KeyError, ValueError):
+        pass
+    arrays = build()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(temporary, **arrays)
+        os.replace(temporary, path)  # 並列に起動したプロセスが書きかけを読まないように
+    except OSError:
+        pass  # キャッシュできなくても表は使える
+    return arrays
@@ -1,10 +1,70 @@
+import heapq
+import math
+
+# シナリオの台本（実行時刻つきのコマンド）を管理するコマンドマップ
+# コマンドは実行時刻順の優先度付きキュー（ヒープ）に入れ、ティックごとに実行時刻を迎えたものだけを取り出す
+# 台本のトリガーが何百件あっても、毎ティック全件の条件を調べることはない
+# コマンドは execute(world) を持つ単純なオブジェクト（スナップショットと一緒に pickle できる）
+
+SCHEDULE_EPSILON = 1e-9  # 実行時刻の比較で許容する丸め誤差（秒）
+
+
 class CommandMap:
     def __init__(self):
-        self.commands = []
+        self.commands = []  # (実行時刻, 追加順, コマンド) のヒープ
+        self.order = 0  # 同じ時刻のコマンドは追加順に実行する
+
+    def add_command(self, command, time=0.0):
+        # time（シミュレーション時刻、秒）に実行するコマンドを追加する
+        heapq.heappush(self.commands, (time, self.order, command))
+        self.order += 1
+
+    def next_time(self):
+        # 次のコマンドの実行時刻（無ければ inf）
+        return self.commands[0][0] if self.commands else math.inf
+
+    def execute_commands(self, world=None, time=math.inf):
+        # 実行時刻が time 以前のコマンドを時刻順に取り出して実行し、実行した数を返す（time 省略時は全部）
+        commands = self.commands
+        executed = 0
+        while commands and commands[0][0] <= time + SCHEDULE_EPSILON:
+            _, _, command = heapq.heappop(commands)
+            command.execute(world)
+            executed += 1
+        return executed
+
+
+# 待機中（リスポーン待ち）の戦闘機を最大 count 機、ただちに基地から発進させる
+class SpawnWave:
+    def __init__(self, team, count):
+        self.team = team  # チームID（simulation.TEAM_BLUE / TEAM_RED）
+        self.count = count
+
+    def execute(self, world):
+        world.scramble(self.team, self.count)
+
+
+# 飛行隊の進路（交戦していない機体が向かう地点）を変える
+class ChangeHeading:
+    def __init__(self, team, destination):
+        self.team = team
+        self.destination = destination  # (x, y)
+
+    def execute(self, world):
+        world.set_destination(self.team, self.destination)
+
+
+# 飛行隊の交戦規定を変える（aircraft.ROE_WEAPONS_FREE / ROE_WEAPONS_HOLD）
+class SetROE:
+    def __init__(self, team, roe):
+        self.team = team
+        self.roe = roe
+
+    def execute(self, world):
+        world.squadrons[self.team].roe = self.roe
 
-    def add_command(self, command):
-        self.commands.append(command)
 
-    def execute_commands(self):
-        for command in self.commands:
-            command.execute()
\ No newline at end of file
+# シナリオを終える（World.run はこのティックで止まる）
+class EndScenario:
+    def execute(self, world):
+        world.finished = True
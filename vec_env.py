@@ -0,0 +1,192 @@
+import numpy as np
+
+from simulation import (AI_TRANSIT_INTERVAL, BLUE, FIRE_COOLDOWN, MAX_MISSILES, RADAR_FOV, RADAR_FREQUENCY, RADAR_RANGE,
+                        RED, World)
+from world_state import TEAM_BLUE
+
+# 学習用のベクトル化環境（gym の VectorEnv に近い API）
+# K 個の独立した交戦（ヘッドレスの World）を同じ歩調で進め、ブルーチームの全機を外部の方策が操縦する
+# レッドチームは従来どおり Fighter.act で動く
+# 観測・行動・報酬・終了フラグは最初に確保した配列を使い回し、step() は毎回同じ配列を返す
+# （保存したい場合は呼び出し側でコピーする）
+#
+# 行動は [環境, 機体, ACTION_SIZE]
+#   turn: 目標方向を現在の機首方向から turn × 180 度に向ける（-1 〜 1）。NaN なら Fighter.act に任せる
+#   fire: 0.5 より大きければ最も近い探知中の敵機へ撃つ（インターバル・発射可能範囲・交戦規定は従来どおり）
+# 報酬はこの step で増えたブルーの撃墜数 − レッドの撃墜数
+
+# 観測の特徴量（[環境, 機体, OBS_SIZE]、距離はレーダー範囲、位置はワールドの大きさで正規化）
+OBS_FIELDS = (
+    'alive', 'x', 'y', 'cos_direction', 'sin_direction', 'can_fire', 'missiles_in_flight', 'avoiding',
+    'contact0_dx', 'contact0_dy', 'contact0_valid',  # 最も近い探知中の敵機
+    'contact1_dx', 'contact1_dy', 'contact1_valid',  # 2番目に近い探知中の敵機
+    'threat_dx', 'threat_dy', 'threat_valid',  # 自機を狙っている最も近いミサイル
+)
+OBS_SIZE = len(OBS_FIELDS)
+CONTACT_SLOTS = 2  # 観測に入れる探知中の敵機の数
+CONTACT_OFFSET = OBS_FIELDS.index('contact0_dx')
+THREAT_OFFSET = OBS_FIELDS.index('threat_dx')
+ACTION_SIZE = 2  # turn, fire
+DEFAULT_ACTION_REPEAT = 4  # 1回の step で進めるティック数
+DEFAULT_EPISODE_TICKS = 120 * 60  # エピソードの長さ（ティック）
+
+
+class VecEnv:
+    def __init__(self, num_envs, fighters_per_team=3, seed=0, action_repeat=DEFAULT_ACTION_REPEAT,
+                 episode_ticks=DEFAULT_EPISODE_TICKS, radar_fov=RADAR_FOV, radar_frequency=RADAR_FREQUENCY,
+                 ai_interval=AI_TRANSIT_INTERVAL):
+        self.num_envs = num_envs
+        self.fighters_per_team = fighters_per_team
+        self.seed = seed
+        self.action_repeat = action_repeat
+        self.episode_ticks = episode_ticks
+        self.world_options = {'radar_fov': radar_fov, 'radar_frequency': radar_frequency, 'ai_interval': ai_interval}
+        self.observations = np.zeros((num_envs, fighters_per_team, OBS_SIZE), dtype=np.float32)
+        self.actions = np.full((num_envs, fighters_per_team, ACTION_SIZE), np.nan, dtype=np.float32)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=bool)
+        self.episodes = np.zeros(num_envs, dtype=np.int64)  # 環境ごとに終えたエピソード数（シードの決定に使う）
+        self.worlds = [None] * num_envs
+        self.controllers = [PolicyControl(self.actions[k]) for k in range(num_envs)]
+        self.score = np.zeros((num_envs, 2), dtype=np.int64)  # 前回の step までの（ブルー, レッド）の撃墜数
+
+    def _new_world(self, k):
+        # 環境 k の次のエピソードのワールド（シードは環境番号とエピソード数で決まる）
+        seed = self.seed + k + self.num_envs * int(self.episodes[k])
+        world = World(self.fighters_per_team, seed=seed, **self.world_options)
+        world.controller = self.controllers[k]
+        self.controllers[k].attach(world.squadrons[TEAM_BLUE])
+        self.worlds[k] = world
+        self.score[k] = 0
+        self._observe(k)
+
+    def reset(self):
+        for k in range(self.num_envs):
+            self._new_world(k)
+        self.rewards[:] = 0
+        self.dones[:] = False
+        return self.observations
+
+    def step(self, actions=None):
+        # actions（省略時は self.actions に書き込んだ値）で全環境を action_repeat ティック進める
+        # 終わった環境は自動でリセットし、その環境の観測は次のエピソードの最初の観測になる
+        if actions is not None:
+            self.actions[:] = actions
+        for k, world in enumerate(self.worlds):
+            for _ in range(self.action_repeat):
+                world.step()
+                if world.finished:
+                    break
+            blue, red = world.kills[BLUE], world.kills[RED]
+            self.rewards[k] = (blue - self.score[k, 0]) - (red - self.score[k, 1])
+            self.score[k] = blue, red
+            done = world.finished or world.tick >= self.episode_ticks
+            self.dones[k] = done
+            if done:
+                self.episodes[k] += 1
+                self._new_world(k)
+            else:
+                self._observe(k)
+        return self.observations, self.rewards, self.dones
+
+    def _observe(self, k):
+        # 環境 k のブルー各機の観測を self.observations[k] に書き込む
+        world = self.worlds[k]
+        obs = self.observations[k]
+        obs[:] = 0
+        squadron = world.squadrons[TEAM_BLUE]
+        members = squadron.aircrafts
+        slots = self.controllers[k].slots
+        state = world.fighter_state
+        state.load('is_alive')
+        alive = state.is_alive[slots]
+        x, y = state.x[slots], state.y[slots]
+        radians = np.radians(state.direction[slots])
+        obs[:, 0] = alive
+        obs[:, 1] = x / world.width
+        obs[:, 2] = y / world.height
+        obs[:, 3] = np.cos(radians)
+        obs[:, 4] = np.sin(radians)
+        frames = world.clock.frames
+        obs[:, 5] = [f.missile_count < MAX_MISSILES and frames - f.last_fired_time >= FIRE_COOLDOWN for f in members]
+        obs[:, 6] = [f.missile_count / MAX_MISSILES for f in members]
+        obs[:, 7] = [f.avoiding_missile is not None for f in members]
+
+        # 探知中の敵機（データリンクの航跡表から機体ごとに近い方から CONTACT_SLOTS 機）
+        if len(squadron.track_enemy):
+            dx = squadron.track_x[None, :] - x[:, None]
+            dy = squadron.track_y[None, :] - y[:, None]
+            order = np.argsort(dx * dx + dy * dy, axis=1, kind='stable')[:, :CONTACT_SLOTS]
+            member = np.flatnonzero(alive)
+            for rank in range(order.shape[1]):
+                track = order[member, rank]
+                column = CONTACT_OFFSET + 3 * rank
+                obs[member, column] = dx[member, track] / RADAR_RANGE
+                obs[member, column + 1] = dy[member, track] / RADAR_RANGE
+                obs[member, column + 2] = 1
+
+        # 自機を狙っている最も近い敵のミサイル
+        missiles = world.missile_state
+        n = missiles.count
+        if n:
+            target = missiles.target_slot[:n]
+            index = np.full(state.count, -1)
+            index[slots] = np.arange(len(slots))
+            member = index[target]
+            hostile = (member >= 0) & (missiles.team[:n] != TEAM_BLUE)
+            member = member[hostile]
+            dx = missiles.x[:n][hostile] - state.x[target[hostile]]
+            dy = missiles.y[:n][hostile] - state.y[target[hostile]]
+            order = np.lexsort((np.hypot(dx, dy), member))
+            member, dx, dy = member[order], dx[order], dy[order]
+            first = np.searchsorted(member, member) == np.arange(len(member))
+            member = member[first]
+            obs[member, THREAT_OFFSET] = dx[first] / RADAR_RANGE
+            obs[member, THREAT_OFFSET + 1] = dy[first] / RADAR_RANGE
+            obs[member, THREAT_OFFSET + 2] = 1
+
+
+# 1つのワールドのブルーチームを行動配列で操縦する（World.controller に入れる）
+class PolicyControl:
+    def __init__(self, actions):
+        self.actions = actions  # [機体, ACTION_SIZE]（VecEnv.actions の1環境分のビュー）
+        self.squadron = None  # 操縦する飛行隊
+        self.slots = None  # 飛行隊の各機の slot（行動・観測の機体の並び順）
+
+    def attach(self, squadron):
+        self.squadron = squadron
+        self.slots = np.array([fighter.slot for fighter in squadron.aircrafts], dtype=np.int64)
+        self.members = {fighter.slot: i for i, fighter in enumerate(squadron.aircrafts)}  # slot → 機体の番号
+        for fighter in squadron.aircrafts:
+            self._clear_avoidance(fighter)
+
+    def decide(self, world, acting, contacts, missiles):
+        # 判断するティックの機体は slot 順に（従来の AI と同じ順序で）、行動が指定されたブルー機は毎ティック動かす
+        actions = self.actions.tolist()
+        decided = set()
+        for fighter in acting:
+            slot = fighter.slot
+            member = self.members.get(slot)
+            if member is None or actions[member][0] != actions[member][0]:  # NaN: 従来の AI に任せる
+                fighter.act(contacts[slot], missiles[slot])
+            else:
+                self._apply(fighter, actions[member], contacts[slot])
+            decided.add(slot)
+        for fighter, action in zip(self.squadron.aircrafts, actions):
+            if fighter.is_alive and fighter.slot not in decided and action[0] == action[0]:
+                self._apply(fighter, action, contacts[fighter.slot])
+
+    @staticmethod
+    def _clear_avoidance(fighter):
+        # 方策が操縦している機体はミサイル回避の判断（Fighter.avoid_missile）をしないので、回避中の記録を消す
+        # （残すと観測の avoiding や回避中の攻撃コーン、AI スケジューラの判定に古い状態が残る）
+        fighter.avoiding_missile = None
+        fighter.avoid_direction = None
+
+    def _apply(self, fighter, action, contacts):
+        turn, fire = action
+        self._clear_avoidance(fighter)
+        fighter.target_direction = (fighter.direction + 180 * min(max(turn, -1.0), 1.0)) % 360
+        if fire > 0.5 and contacts:
+            enemy, distance, bearing = min(contacts, key=lambda contact: contact[1])
+            fighter.fire_missile(enemy, distance, bearing)
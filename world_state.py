@@ -0,0 +1,101 @@
+from operator import attrgetter
+
+import numpy as np
+
+# 戦闘機・ミサイルの状態を連続した NumPy 配列（Structure of Arrays）で保持する
+# 運動計算で変わるフィールド（位置・向き・速度など）は配列が正本で、Fighter / Missile の属性（array_field）は
+# 自分の行（slot）を直接読み書きする。ティックごとの書き戻しは無い
+# AI や衝突判定が書き換えるフィールド（target_direction・is_alive）はオブジェクトが正本で、
+# 配列演算の直前に load で必要なものだけ読み込む
+
+# 戦闘機の状態フィールド
+FIGHTER_FIELDS = {
+    'x': np.float64,
+    'y': np.float64,
+    'direction': np.float64,
+    'target_direction': np.float64,
+    'speed': np.float64,
+    'is_alive': np.bool_,
+    'team': np.int8,
+}
+
+# ミサイルの状態フィールド
+MISSILE_FIELDS = {
+    'x': np.float64,
+    'y': np.float64,
+    'direction': np.float64,
+    'speed': np.float64,
+    'age': np.float64,  # 経過フレーム数
+    'expired': np.bool_,
+    'target_slot': np.int32,  # 目標の戦闘機の slot
+    'team': np.int8,
+}
+
+# チームID
+TEAM_BLUE = 0
+TEAM_RED = 1
+
+# 行数（ワールド全体では戦闘機とミサイルの合計）がこれ以下なら、配列演算の代わりに1行ずつ Python のスカラーで計算する
+# （数機の戦闘では、要素ごとの計算より NumPy を呼び出すたびの固定費の方が大きいため）
+# 8v8〜24v24 の step を合計ごとに計測すると、24〜31 では1ティックあたり約 55 µs 速く、32〜39 では約 40 µs 遅い
+SCALAR_LIMIT = 32
+
+
+class EntityArrays:
+    def __init__(self, fields, capacity=64):
+        self.fields = fields
+        self.capacity = capacity
+        self.count = 0  # 使用中の行数（0..count-1 が常に詰まっている）
+        self.objects = []  # slot に対応するオブジェクト
+        for name, dtype in fields.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def _grow(self):
+        # 容量を倍にして配列を作り直す
+        self.capacity *= 2
+        for name in self.fields:
+            old = getattr(self, name)
+            new = np.zeros(self.capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, obj):
+        if self.count == self.capacity:
+            self._grow()
+        slot = self.count
+        self.objects.append(obj)
+        self.count += 1
+        obj.slot = slot  # 行の値は呼び出し側が書き込む
+        return slot
+
+    def remove(self, slot):
+        # 最後の行を空いた行に移して詰める（swap-remove）
+        last = self.count - 1
+        if slot != last:
+            for name in self.fields:
+                array = getattr(self, name)
+                array[slot] = array[last]
+            moved = self.objects[last]
+            self.objects[slot] = moved
+            moved.slot = slot
+        self.objects.pop()
+        self.count -= 1
+
+    def load(self, *names):
+        # オブジェクトが正本のフィールドを配列へまとめて読み込む
+        for name in names:
+            getattr(self, name)[:self.count] = list(map(attrgetter(name), self.objects))
+
+
+# 配列が正本のフィールドを、オブジェクトの属性として読み書きする（オブジェクトは state と slot を持つこと）
+# 読むと Python のスカラーを返す
+def array_field(name):
+    array = attrgetter(name)
+
+    def get(self):
+        return array(self.state).item(self.slot)
+
+    def set(self, value):
+        array(self.state)[self.slot] = value
+
+    return property(get, set)